@@ -0,0 +1,93 @@
+import os
+import re
+import sys
+import glob
+import time
+import argparse
+import multiprocessing
+
+from Main import solveInstance
+from src.vrp.svrp.outputdata.ProblemSolution import ProblemSolution
+
+def getInstanceName(path):
+    return re.sub(r"\.svrp(\.gz)?$", "", os.path.basename(path))
+
+def getInstanceSize(path):
+    # instance names look like PC-n200-d2-vt3-t50-s50
+    size = []
+    for key in ["n", "t", "s"]:
+        m = re.search(r"-" + key + r"(\d+)", getInstanceName(path))
+        size.append(int(m.group(1)) if m else 0)
+    return size
+
+def getSolvedInstances():
+    # instances that already have a line in the stats file
+    solved = set()
+    if not os.path.exists(ProblemSolution.statsFileName):
+        return solved
+
+    f = open(ProblemSolution.statsFileName)
+    for line in f:
+        name = line.split(";")[0].strip()
+        if name != "" and name != "Instance":
+            solved.add(name)
+    f.close()
+    return solved
+
+def runBatch(paths, numWorkers, timeLimit, resume):
+    if resume:
+        solved = getSolvedInstances()
+        skipped = [p for p in paths if getInstanceName(p) in solved]
+        paths = [p for p in paths if getInstanceName(p) not in solved]
+        print "Skipping " + str(len(skipped)) + " instances already in " + ProblemSolution.statsFileName
+
+    # start the largest instances first, they dominate the wall time
+    pending = sorted(paths, key=getInstanceSize, reverse=True)
+    running = []
+    statsLock = multiprocessing.Lock()
+
+    while len(pending) > 0 or len(running) > 0:
+        # fill the free worker slots
+        while len(pending) > 0 and len(running) < numWorkers:
+            path = pending.pop(0)
+            p = multiprocessing.Process(target=solveInstance, args=(path, statsLock))
+            p.start()
+            running.append((p, path, time.time()))
+            print "Started " + path
+
+        time.sleep(0.5)
+
+        stillRunning = []
+        for p, path, start in running:
+            if not p.is_alive():
+                p.join()
+                print "Finished " + path + " (exit code " + str(p.exitcode) + ")"
+            elif timeLimit > 0 and time.time() - start > timeLimit:
+                p.terminate()
+                p.join()
+                print "Time limit reached, stopped " + path
+            else:
+                stillRunning.append((p, path, start))
+        running = stillRunning
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a batch of SVRP instances in parallel.")
+    parser.add_argument("instances", nargs="*", default=["Instances/*.svrp"],
+                        help="instance files or glob patterns (default: Instances/*.svrp)")
+    parser.add_argument("-w", "--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="number of instances solved at the same time")
+    parser.add_argument("-t", "--time-limit", type=float, default=0,
+                        help="wall time limit per instance in seconds (0 for none)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="also solve instances that are already in the stats file")
+    args = parser.parse_args()
+
+    paths = []
+    for pattern in args.instances:
+        paths.extend(sorted(glob.glob(pattern)))
+
+    if len(paths) == 0:
+        print "No instances found"
+        sys.exit(1)
+
+    runBatch(paths, args.workers, args.time_limit, not args.no_resume)
@@ -3,29 +3,31 @@ import time
 import sys
 
 from src.vrp.svrp.inputdata.ProblemData import ProblemData
-from src.vrp.svrp.solver.Solver import Solver
 from src.vrp.svrp.solver.BendersSolver import BendersSolver
-from src.vrp.svrp.solver.BendersCBSolver import BendersCBSolver
 
-# set the random seed
-np.random.seed(1)
+def solveInstance(path="", statsLock=None):
+    # each instance draws its scenarios from its own generator with a fixed seed
+    rng = np.random.RandomState(1)
 
-# read the input and create the problem data
-path = ""
-if len(sys.argv) >= 2:
-    path = sys.argv[1]
+    # read the input and create the problem data
+    pdata = ProblemData(path, rng=rng)
 
-pdata = ProblemData(path)
+    # Create the solver
+    solverCB = BendersSolver(pdata)
 
-# Create the solver
-solverCB = BendersSolver()
+    start_time = time.time()
+    solverCB.solve()
+    end_time = time.time()
 
-start_time = time.time()
-solverCB.solve()
-end_time = time.time()
+    pdata.problemSolution.elapsedTime = (end_time - start_time)
+    pdata.problemSolution.saveToFile(statsLock)
 
-pdata.problemSolution.elapsedTime = (end_time - start_time)
-pdata.problemSolution.saveToFile()
+    print("--- %s seconds ---" % (end_time - start_time))
 
-print("--- %s seconds ---" % (end_time - start_time))
+# worker processes re-import this module, so only run when executed as a script
+if __name__ == "__main__":
+    path = ""
+    if len(sys.argv) >= 2:
+        path = sys.argv[1]
 
+    solveInstance(path)
@@ -1,7 +1,7 @@
-import itertools
+import numpy as np
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
 from src.vrp.svrp.inputdata.Route import Route
+from src.vrp.svrp.inputdata.RouteBuilder import buildRoutes
 
 class Cluster:
     def __init__(self, id, depot, pdata):
@@ -12,39 +12,27 @@ class Cluster:
         self.routes = {}
         self.numRoutes = 0
 
-    def createRoutes(self, vt):
-        routes = []
-
+    def getCustomers(self, vt):
         # Select customers that accept the vehicle type vt
-        customers = [c for c in self.customers if vt in c.acceptedVehicleTypes]
-
-        for i in range(1, params.maxCustomersPerRoute+1):
-            newroutes = list(itertools.combinations(customers, i))
-            routes.extend(newroutes)
-
-        t = (self.depot, )
-        for i in range(len(routes)):
-            r = routes[i]
-            minRoute = r
-            minDistance = 1000000000000000
+        return [c for c in self.customers if vt in c.acceptedVehicleTypes]
 
-            if len(r) >= 3:
-                # try all possible permutations of the route, and pick the cheapest
-                allRoutes = list(itertools.permutations(r, len(r)))
+    def getRouteTask(self, vt):
+        # distances between the depot (row 0) and the customers accepting vt
+        idx = [self.pdata.customerIndex[c.id] for c in [self.depot] + self.getCustomers(vt)]
+        distances = self.pdata.distances[np.ix_(idx, idx)].tolist()
+        return (distances, self.pdata.params.maxCustomersPerRoute)
 
-                for j in range(0, len(allRoutes)):
-                    r = allRoutes[j]
-                    r = t + r + t
-                    distance = self.pdata.getRouteLength(r)
-                    if minDistance > distance:
-                        minDistance = distance
-                        minRoute = r
+    def createRoutes(self, vt):
+        # build the cheapest visiting order of every subset of up to maxCustomersPerRoute customers
+        self.setRoutes(vt, buildRoutes(self.getRouteTask(vt)))
 
-            else:
-                minRoute = t + minRoute + t
-                minDistance = self.pdata.getRouteLength(minRoute)
+    def setRoutes(self, vt, paths):
+        customers = self.getCustomers(vt)
 
-            route = Route(self.numRoutes, minRoute, minDistance)
+        t = (self.depot, )
+        for path, distance in paths:
+            r = t + tuple([customers[p] for p in path]) + t
+            route = Route(self.numRoutes, r, distance)
 
             if vt not in self.routes:
                 self.routes[vt] = []
@@ -52,4 +40,9 @@ class Cluster:
 
             self.numRoutes += 1
 
-
+    def selectRoutes(self, pool, present):
+        # take the routes of the depot pool whose customers are all present
+        routes = pool.selectRoutes(present)
+        if len(routes) > 0:
+            self.routes[pool.vehicleType] = routes
+            self.numRoutes += len(routes)
@@ -3,3 +3,66 @@ class Parameters:
     numberOfScenariosPerShift = 10
     maxCustomersPerRoute = 3
 
+    # build the routes once per depot and vehicle type and filter them for each scenario
+    useRoutePool = True
+
+    # worker processes used to build the routes (1 builds them in this process)
+    numWorkers = 1
+
+    # keep a compiled copy (.npz) next to each instance to skip text parsing on later runs
+    useInstanceCache = False
+
+    # subproblem results kept for repeated leased fleet values of a depot (0 disables the cache),
+    # the least recently used results are dropped first
+    subproblemCacheSize = 100000
+
+    # worker processes that keep a share of the subproblem models and solve them
+    # in parallel on every Benders iteration (1 solves them in this process)
+    numSubproblemWorkers = 1
+
+    # cplex threads of the branch-and-cut master, lazy callbacks may then overlap
+    numMasterThreads = 1
+
+    # "dp" solves the subproblems of clusters with at most dpMaxCustomers customers
+    # with an exact dynamic program instead of a cplex model
+    subproblemBackend = "cplex"
+    dpMaxCustomers = 16
+
+    # solve every distinct subproblem for all the leased fleet vectors before the
+    # Benders iterations, which then only look the results up
+    useValueTables = False
+
+    # Benders optimality cuts: "nogood" binds alpha only at the current fleet, "lshaped" adds
+    # the lower bound of each subproblem (its cost with the largest fleet) and "monotone"
+    # also covers every fleet that is nowhere larger than the current one
+    optimalityCuts = "nogood"
+
+    # iterations a Benders cut may stay slack in the master before it is removed (0 keeps all)
+    cutPurgeAge = 0
+
+    # start every master solve of the regular Benders loop from the fleet of the previous
+    # master solution and the fleet of the best upper bound found so far
+    useMasterMIPStarts = True
+
+    # fleet vectors of the master's solution pool evaluated on each regular Benders iteration,
+    # the optimal one and the next best distinct fleets that were not evaluated before
+    masterPoolFleets = 1
+
+    # granularity of the Benders optimality cuts: "multi" adds one per subproblem on its alpha,
+    # "shift" sums the cuts of the scenarios of each shift and depot on its alphaH and "single"
+    # sums all of them on one column, the smaller masters need more iterations
+    cutAggregation = "multi"
+
+    # stabilization of the regular Benders loop: "none" or "trustregion", a local branching row
+    # that keeps the master within trustRegionRadius flipped "n" binaries of the best fleet
+    # found so far (changing the fleet of one depot and vehicle type flips two), the radius
+    # doubles whenever the region has nothing better and the row is dropped once it covers
+    # every fleet, so the loop still ends at the optimum
+    stabilization = "none"
+    trustRegionRadius = 2
+
+    # pipelined regular Benders (needs numSubproblemWorkers > 1): the master is solved again
+    # once asyncMinShare of the workers answered for its last fleet, while the others still
+    # run, the solution pool fleets and the stabilization are not used in this mode
+    asyncBenders = False
+    asyncMinShare = 0.5
@@ -1,29 +1,36 @@
 from __future__ import division
 
-import Tkinter
-import tkFileDialog
+import os
 import re
+import copy
+import gzip
 import math
+import multiprocessing
 import numpy as np
 
 from src.vrp.data.Data import *
 from src.vrp.svrp.inputdata.Scenario import Scenario
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
+from src.vrp.svrp.inputdata.RoutePool import RoutePool
+from src.vrp.svrp.inputdata.RouteBuilder import buildRoutes
+from src.vrp.svrp.inputdata.Parameters import Parameters
 from src.vrp.svrp.outputdata.ProblemSolution import ProblemSolution
 
-class Singleton(type):
-    _instances = {}
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
-
-
 class ProblemData(object):
-    __metaclass__ = Singleton
+    headers = ["NAME", "DIMENSION", "SHIFTS", "SCENARIOS", "DEMAND_MEAN", "DEMAND_SD", "SHIFT_SWITCH_PROB"]
+    sections = ["NODE_COORD_SECTION", "VEHICLE_SECTION", "DEPOT_SECTION", "DEMAND_SECTION",
+                "DAYTIME_CUSTOMERS_SECTION"]
+
+    # bump when the layout of the compiled instance files changes
+    cacheVersion = 1
 
-    def __init__(self, path=""):
+    def __init__(self, path="", params=None, rng=None):
         print "creating problemdata instance"
+
+        # parameters and random generator of this instance, the defaults are the
+        # Parameters class values and the global numpy generator
+        self.params = copy.copy(params) if params is not None else Parameters()
+        self.rng = rng if rng is not None else np.random
+
         self.instanceName = ""
         self.problemSolution = None
         self.n = 0
@@ -42,92 +49,161 @@ class ProblemData(object):
         self.customers = {}
         self.depots = {}
         self.depotCosts = {}
-        self.distances = {}
+        self.distances = None
+        self.customerIds = None
+        self.customerIndex = {}
+        self.depotList = []
+        self.depotIndices = None
+        self.closestDepot = None
         self.vehicleTypes = []
         self.scenarios = {}
+        self.routePools = {}
+        self.customerPresence = None
         self.readInstance(path)
+        self.createRoutePools()
         self.createScenarios()
-        self.master = None
 
     def readInstance(self, path=""):
         # Open file dialog to select base vrp instance
         if path == "":
+            # the GUI stack is only loaded when a dialog is actually needed
+            import Tkinter
+            import tkFileDialog
+
             Tkinter.Tk().withdraw()
             path = tkFileDialog.askopenfilename(filetypes=[("VRP Instances", ".svrp")])
 
-        self.instanceName = path.replace(".svrp", "")
+        self.instanceName = re.sub(r"\.svrp(\.gz)?$", "", path)
 
-        f = open(path)
-        section = 0
+        # use the compiled instance if there is an up to date one, otherwise parse the text file
+        data = None
+        if self.params.useInstanceCache:
+            data = self.loadInstanceCache(path)
+        if data is None:
+            data = self.parseInstance(path)
+            if self.params.useInstanceCache:
+                self.saveInstanceCache(path, data)
 
-        for line in f:
-            if "DIMENSION" in line:
-                self.n = int(re.search(r'\d+', line).group())
-            elif "NAME" in line:
-                info = [str(x) for x in line.split()]
-                self.instanceName = info[1]
-            elif "SHIFTS" in line:
-                self.shifts = int(re.search(r'\d+', line).group())
-            elif "SCENARIOS" in line:
-                params.numberOfScenariosPerShift = int(re.search(r'\d+', line).group())
-            elif "DEMAND_MEAN" in line:
-                self.demandDistributionMean = float(re.search(r"[-+]?\d*\.\d+|\d+", line).group())
-            elif "DEMAND_SD" in line:
-                self.demandDistributionSD = float(re.search(r"[-+]?\d*\.\d+|\d+", line).group())
-            elif "SHIFT_SWITCH_PROB" in line:
-                self.shiftSwitchProb = float(re.search(r"[-+]?\d*\.\d+|\d+", line).group())
-            elif "NODE_COORD_SECTION" in line:
-                section = 1
-            elif "VEHICLE_SECTION" in line:
-                section = 2
-            elif "DEPOT_SECTION" in line:
-                section = 3
-            elif "DEMAND_SECTION" in line:
-                section = 4
-            elif "DAYTIME_CUSTOMERS_SECTION" in line:
-                section = 5
-            elif section == 1:
-                # Obtain customer information
-                info = [float(x) for x in line.split()]
-
-                # Create new customer and add it to the list
-                c = Customer(int(info[0]), float(info[1]), float(info[2]), False)
-                self.customers[c.id] = c
-            elif section == 2:
-                info = [int(x) for x in line.split()]
-                vt = Vehicle(info[0], info[1], info[2], info[3], info[4])
-                self.vehicleTypes.append(vt)
-            elif section == 3:
-                info = [float(x) for x in line.split()]
-
-                id = int(info[0])
-                vt = int(info[1])
-                cost = float(info[2])
-
-                d = self.customers[id]
-                d.isDepot = True
-                self.depots[id] = d
-                if id not in self.depotCosts:
-                    self.depotCosts[id] = {}
-                self.depotCosts[id][vt] = cost
-            elif section == 4:
-                info = [int(x) for x in line.split()]
-
-                cid = info[0]
-                self.customers[cid].acceptedVehicleTypes = info[1:]
-            elif section == 5:
-                id = int(line)
-                c = self.customers[id]
-                c.isDayCustomer = True
-                self.dayCustomers[c.id] = c
-
-        f.close()
+        self.buildInstance(data)
         self.setAfternoonCustomers()
         self.makeDemandDistribution()
         self.computeDistances()
+        self.computeClosestDepots()
         self.problemSolution = ProblemSolution()
         self.problemSolution.initialize(self)
 
+    def parseInstance(self, path):
+        headers = {}
+        rows = {}
+        section = None
+
+        if path.endswith(".gz"):
+            f = gzip.open(path, "rb")
+        else:
+            f = open(path)
+
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0:
+                continue
+
+            key = tokens[0].rstrip(":")
+            if key in ProblemData.sections:
+                section = key
+                rows[section] = []
+            elif key in ProblemData.headers:
+                headers[key] = line.split(":", 1)[1].strip()
+            elif section is not None:
+                rows[section].append(tokens)
+
+        f.close()
+
+        # variable length acceptance lists are stored flattened, with offsets per customer
+        demands = rows.get("DEMAND_SECTION", [])
+        acceptIds = np.array([int(r[0]) for r in demands], dtype=int)
+        acceptOffsets = np.cumsum([0] + [len(r) - 1 for r in demands])
+        acceptTypes = np.array([int(t) for r in demands for t in r[1:]], dtype=int)
+
+        data = {}
+        data["name"] = np.array(headers.get("NAME", self.instanceName))
+        data["header"] = np.array([int(headers.get("DIMENSION", 0)),
+                                   int(headers.get("SHIFTS", 0)),
+                                   int(headers.get("SCENARIOS", self.params.numberOfScenariosPerShift))])
+        data["demand"] = np.array([float(headers.get("DEMAND_MEAN", 0)),
+                                   float(headers.get("DEMAND_SD", 0)),
+                                   float(headers.get("SHIFT_SWITCH_PROB", 0))])
+        data["coords"] = np.array([r[:3] for r in rows.get("NODE_COORD_SECTION", [])], dtype=float).reshape(-1, 3)
+        data["vehicles"] = np.array([r[:5] for r in rows.get("VEHICLE_SECTION", [])], dtype=int).reshape(-1, 5)
+        data["depots"] = np.array([r[:3] for r in rows.get("DEPOT_SECTION", [])], dtype=float).reshape(-1, 3)
+        data["acceptIds"] = acceptIds
+        data["acceptOffsets"] = acceptOffsets
+        data["acceptTypes"] = acceptTypes
+        data["dayCustomers"] = np.array([int(r[0]) for r in rows.get("DAYTIME_CUSTOMERS_SECTION", [])], dtype=int)
+        data["version"] = np.array(ProblemData.cacheVersion)
+        return data
+
+    def getCachePath(self, path):
+        return re.sub(r"\.gz$", "", path) + ".npz"
+
+    def loadInstanceCache(self, path):
+        cachePath = self.getCachePath(path)
+        if not os.path.exists(cachePath) or os.path.getmtime(cachePath) < os.path.getmtime(path):
+            return None
+
+        data = dict(np.load(cachePath))
+        if int(data["version"]) != ProblemData.cacheVersion:
+            return None
+        return data
+
+    def saveInstanceCache(self, path, data):
+        # the cache is only an optimization, ignore read only instance directories
+        try:
+            f = open(self.getCachePath(path), "wb")
+            np.savez(f, **data)
+            f.close()
+        except (IOError, OSError):
+            pass
+
+    def buildInstance(self, data):
+        self.instanceName = str(data["name"])
+        self.n = int(data["header"][0])
+        self.shifts = int(data["header"][1])
+        self.params.numberOfScenariosPerShift = int(data["header"][2])
+        self.demandDistributionMean = float(data["demand"][0])
+        self.demandDistributionSD = float(data["demand"][1])
+        self.shiftSwitchProb = float(data["demand"][2])
+
+        # Create the customers
+        for info in data["coords"]:
+            c = Customer(int(info[0]), float(info[1]), float(info[2]), False)
+            self.customers[c.id] = c
+
+        for info in data["vehicles"]:
+            vt = Vehicle(int(info[0]), int(info[1]), int(info[2]), int(info[3]), int(info[4]))
+            self.vehicleTypes.append(vt)
+
+        for info in data["depots"]:
+            id = int(info[0])
+            vt = int(info[1])
+            cost = float(info[2])
+
+            d = self.customers[id]
+            d.isDepot = True
+            self.depots[id] = d
+            if id not in self.depotCosts:
+                self.depotCosts[id] = {}
+            self.depotCosts[id][vt] = cost
+
+        offsets = data["acceptOffsets"]
+        for k in range(len(data["acceptIds"])):
+            cid = int(data["acceptIds"][k])
+            self.customers[cid].acceptedVehicleTypes = data["acceptTypes"][offsets[k]:offsets[k+1]].tolist()
+
+        for id in data["dayCustomers"]:
+            c = self.customers[int(id)]
+            c.isDayCustomer = True
+            self.dayCustomers[c.id] = c
+
     def setAfternoonCustomers(self):
         for key, c in self.customers.iteritems():
             if not c.isDayCustomer:
@@ -135,55 +211,149 @@ class ProblemData(object):
 
     def makeDemandDistribution(self):
         days = int(math.ceil((self.shifts + 1) / 2))
-        self.demandDistribution = list(np.random.normal(self.demandDistributionMean, self.demandDistributionSD, days))
+        self.demandDistribution = list(self.rng.normal(self.demandDistributionMean, self.demandDistributionSD, days))
         print self.demandDistribution
 
     def computeDistances(self):
-        for k1, c1 in self.customers.iteritems():
-            self.distances[c1.id] = {}
-            for k2, c2 in self.customers.iteritems():
-                if c1.id == c2.id:
-                    continue
+        # map customer ids to contiguous matrix indices
+        ids = sorted(self.customers.keys())
+        self.customerIds = np.array(ids)
+        self.customerIndex = {}
+        for idx, cid in enumerate(ids):
+            self.customerIndex[cid] = idx
 
-                x1 = c1.x
-                y1 = c1.y
-                y2 = c2.y
-                x2 = c2.x
+        # compute the whole euclidean distance matrix in one pass
+        x = np.array([self.customers[cid].x for cid in ids])
+        y = np.array([self.customers[cid].y for cid in ids])
+        dx = x[np.newaxis, :] - x[:, np.newaxis]
+        dy = y[np.newaxis, :] - y[:, np.newaxis]
+        self.distances = np.sqrt(dx * dx + dy * dy)
 
-                dist = math.sqrt(pow(x2 - x1, 2) + pow(y2 - y1, 2))
-                self.distances[c1.id][c2.id] = dist
+        # matrix indices of the depots, in the same order as self.depots
+        self.depotList = [d for k, d in self.depots.iteritems()]
+        self.depotIndices = np.array([self.customerIndex[d.id] for d in self.depotList], dtype=int)
 
     def getDistance(self, c1, c2):
-        return self.distances[c1.id][c2.id]
+        return self.distances[self.customerIndex[c1.id], self.customerIndex[c2.id]]
 
     def getRouteLength(self, customers):
-        distance = 0
-        for i in range(len(customers)-1):
-            c1 = customers[i]
-            c2 = customers[i+1]
-            distance += self.getDistance(c1,c2)
+        idx = [self.customerIndex[c.id] for c in customers]
+        return float(self.distances[idx[:-1], idx[1:]].sum())
+
+    def computeClosestDepots(self):
+        # distances from every customer to every depot
+        dists = self.distances[:, self.depotIndices]
 
-        return distance
+        # a depot is never its own closest depot
+        dists[self.depotIndices, np.arange(len(self.depotIndices))] = np.inf
 
+        # position in depotList of the closest depot of each customer, -1 if there is none
+        self.closestDepot = np.argmin(dists, axis=1)
+        self.closestDepot[np.isinf(dists).all(axis=1)] = -1
 
     def getClosestDepot(self, c):
-        depot = None
-        minVal = 1000000000
+        pos = self.closestDepot[self.customerIndex[c.id]]
+        if pos < 0:
+            return None
+        return self.depotList[pos]
+
+    def createRoutePools(self):
+        if not self.params.useRoutePool:
+            return
+
+        print "Creating route pools..."
+
+        # customers that can ever be allocated to each depot
+        allocated = {}
         for k, d in self.depots.iteritems():
-            try:
-                dist = self.distances[c.id][d.id]
-                if dist < minVal:
-                    minVal = dist
-                    depot = d
-            except KeyError:
-                pass
-        return depot
+            allocated[d.id] = []
+        for k, c in self.customers.iteritems():
+            if c.isDepot:
+                continue
+            depot = self.getClosestDepot(c)
+            allocated[depot.id].append(c)
+
+        pools = []
+        for k, d in self.depots.iteritems():
+            self.routePools[d.id] = {}
+            for vt in self.vehicleTypes:
+                customers = [c for c in allocated[d.id] if vt.type in c.acceptedVehicleTypes]
+                customers.sort(key=lambda c: c.id)
+                pool = self.routePools[d.id][vt.type] = RoutePool(d, vt.type, customers, self)
+                pools.append(pool)
+
+        tasks = [pool.getRouteTask() for pool in pools]
+        for pool, paths in zip(pools, self.buildRoutes(tasks)):
+            pool.setRoutes(paths)
+
+    def buildRoutes(self, tasks):
+        # run the route builder tasks, spread over a pool of worker processes if requested.
+        # map keeps the order of the tasks, so the result does not depend on the pool size
+        if self.params.numWorkers <= 1 or len(tasks) <= 1:
+            return map(buildRoutes, tasks)
+
+        pool = multiprocessing.Pool(min(self.params.numWorkers, len(tasks)))
+        try:
+            return pool.map(buildRoutes, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    def sampleCustomers(self):
+        # Bernoulli draws for every shift, scenario and customer in a single call. Each
+        # scenario consumes its draws in the order they used to be taken one by one:
+        # first the customers of the shift, then the customers of the other shift.
+        numCustomers = len(self.customerIds)
+        draws = self.rng.uniform(size=(self.shifts, self.params.numberOfScenariosPerShift, numCustomers))
+        self.customerPresence = np.zeros(draws.shape, dtype=bool)
+
+        for t in range(self.shifts):
+            # Get the demand ratio for the associated shift
+            day = int(math.floor((t + 1) / 2))
+            dprob = self.demandDistribution[day]
+
+            # We're assuming odd shifts as day shifts
+            if t % 2 != 0:
+                sCustomers = self.dayCustomers
+                oCustomers = self.afternoonCustomers
+            else:
+                sCustomers = self.afternoonCustomers
+                oCustomers = self.dayCustomers
+
+            order = [self.customerIndex[c.id] for k, c in sCustomers.iteritems()] + \
+                    [self.customerIndex[c.id] for k, c in oCustomers.iteritems()]
+            probs = np.array([dprob] * len(sCustomers) + [self.shiftSwitchProb] * len(oCustomers))
+
+            self.customerPresence[t][:, order] = draws[t] <= probs
 
     def createScenarios(self):
         print "Creating scenarios..."
+        self.sampleCustomers()
         for t in range(self.shifts):
             self.scenarios[t] = {}
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 self.scenarios[t][i] = Scenario(i,t,self)
+        self.createClusterRoutes()
+
+    def createClusterRoutes(self):
+        # filtering the route pools is cheap, do it in this process
+        if self.params.useRoutePool or self.params.numWorkers <= 1:
+            for t in range(self.shifts):
+                for i in range(self.params.numberOfScenariosPerShift):
+                    self.scenarios[t][i].createClusterRoutes()
+            return
+
+        # otherwise build the routes of every cluster of every scenario in the worker pool
+        targets = []
+        tasks = []
+        for t in range(self.shifts):
+            for i in range(self.params.numberOfScenariosPerShift):
+                for cluster in self.scenarios[t][i].clusterList:
+                    for vt in self.vehicleTypes:
+                        targets.append((cluster, vt.type))
+                        tasks.append(cluster.getRouteTask(vt.type))
+
+        for (cluster, vt), paths in zip(targets, self.buildRoutes(tasks)):
+            cluster.setRoutes(vt, paths)
 
 # data = ProblemData()
\ No newline at end of file
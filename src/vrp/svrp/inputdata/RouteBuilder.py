@@ -0,0 +1,80 @@
+import itertools
+
+class RouteBuilder:
+    def __init__(self, distances, maxCustomers):
+        # distances is a square nested list, row/column 0 is the depot and
+        # rows 1..m are the customers that may be routed
+        self.distances = distances
+        self.maxCustomers = maxCustomers
+        self.numCustomers = len(distances) - 1
+
+    def getLength(self, path):
+        d = self.distances
+        distance = 0
+        prev = 0
+        for p in path:
+            distance += d[prev][p + 1]
+            prev = p + 1
+        distance += d[prev][0]
+        return distance
+
+    def build(self):
+        # Held-Karp: for every subset s and every customer j of s, keep the cheapest
+        # path that leaves the depot, visits all of s and ends at j. The paths of the
+        # k-subsets are extended from the paths of the (k-1)-subsets.
+        d = self.distances
+        routes = []
+        paths = {}
+
+        for k in range(1, self.maxCustomers + 1):
+            newPaths = {}
+            for s in itertools.combinations(range(self.numCustomers), k):
+                ends = []
+                if k == 1:
+                    ends.append((d[0][s[0] + 1], s))
+                else:
+                    for pos in range(k):
+                        j = s[pos]
+                        prev = paths[s[:pos] + s[pos + 1:]]
+                        best = None
+                        for cost, path in prev:
+                            cost += d[path[-1] + 1][j + 1]
+                            if best is None or cost < best[0]:
+                                best = (cost, path + (j,))
+                        ends.append(best)
+
+                newPaths[s] = ends
+                path = self.closePath(s, ends)
+                routes.append((path, self.getLength(path)))
+            paths = newPaths
+
+        return routes
+
+    def closePath(self, s, ends):
+        # short routes are kept in the order of the subset
+        if len(s) < 3:
+            return s
+
+        d = self.distances
+        minPath = None
+        minDistance = 1000000000000000
+        for cost, path in ends:
+            cost += d[path[-1] + 1][0]
+            if minDistance > cost:
+                minDistance = cost
+                minPath = path
+
+        # a route and its reverse have the same length, keep the first one in
+        # permutation order so routes do not depend on the search direction
+        reverse = minPath[::-1]
+        if self.getLength(reverse) < minDistance or \
+                (self.getLength(reverse) == minDistance and reverse < minPath):
+            minPath = reverse
+
+        return minPath
+
+
+def buildRoutes(task):
+    # entry point for worker processes, task is a (distances, maxCustomers) pair
+    distances, maxCustomers = task
+    return RouteBuilder(distances, maxCustomers).build()
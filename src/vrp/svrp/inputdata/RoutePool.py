@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.vrp.svrp.inputdata.Route import Route
+
+class RoutePool:
+    def __init__(self, depot, vt, customers, pdata):
+        self.depot = depot
+        self.vehicleType = vt
+        self.pdata = pdata
+        self.customers = customers
+        self.routes = []
+        self.members = None
+
+    def getRouteTask(self):
+        # distances between the depot (row 0) and every customer of the pool
+        idx = [self.pdata.customerIndex[c.id] for c in [self.depot] + self.customers]
+        distances = self.pdata.distances[np.ix_(idx, idx)].tolist()
+        return (distances, self.pdata.params.maxCustomersPerRoute)
+
+    def setRoutes(self, paths):
+        # matrix indices of the customers of each route, padded with one past the
+        # last index, which scenarios always mark as present
+        sentinel = len(self.pdata.customerIds)
+        self.members = np.full((len(paths), self.pdata.params.maxCustomersPerRoute), sentinel, dtype=int)
+        idx = [self.pdata.customerIndex[c.id] for c in [self.depot] + self.customers]
+
+        t = (self.depot, )
+        for k in range(len(paths)):
+            path, distance = paths[k]
+            r = t + tuple([self.customers[p] for p in path]) + t
+            self.routes.append(Route(k, r, distance))
+            self.members[k, :len(path)] = [idx[p + 1] for p in path]
+
+    def selectRoutes(self, present):
+        # a route can be used in a scenario iff all of its customers are present
+        mask = present[self.members].all(axis=1)
+        return [self.routes[k] for k in np.flatnonzero(mask)]
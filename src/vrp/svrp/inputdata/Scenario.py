@@ -1,11 +1,9 @@
 from __future__ import division
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 from ProblemData import *
 from Cluster import *
-from Parameters import Parameters as params
 
 class Scenario:
     def __init__(self, id, shift, pdata):
@@ -15,38 +13,17 @@ class Scenario:
         self.customers = {}
         self.clusters = {}
         self.clusterList = []
+        self.present = None
         self.selectRandomCustomers()
         self.allocateCustomers()
-        self.createClusterRoutes()
 
     def selectRandomCustomers(self):
-        # Get the demand ratio for the associated shift
-        day = int(math.floor((self.shift + 1) / 2))
-        dprob = self.pdata.demandDistribution[day]
-
-        # We're assuming odd shifts as day shifts
-        isDayShift = (self.shift % 2 != 0)
-        sCustomers = {}
-        oCustomers = {}
-
-        if isDayShift:
-            sCustomers = self.pdata.dayCustomers
-            oCustomers = self.pdata.afternoonCustomers
-        else:
-            sCustomers = self.pdata.afternoonCustomers
-            oCustomers = self.pdata.dayCustomers
-
-        # get customers for this type off shift
-        for key, c in sCustomers.iteritems():
-            p = np.random.uniform()
-            if p <= dprob:
-                self.customers[c.id] = c
-
-        # see if any customer of other shift changes mind
-        for key, c in oCustomers.iteritems():
-            p = np.random.uniform()
-            if p <= self.pdata.shiftSwitchProb:
-                self.customers[c.id] = c
+        # presence of each customer in this scenario, a view into ProblemData.customerPresence
+        self.present = self.pdata.customerPresence[self.shift, self.id]
+
+        for idx in np.flatnonzero(self.present):
+            c = self.pdata.customers[int(self.pdata.customerIds[idx])]
+            self.customers[c.id] = c
 
     def allocateCustomers(self):
         # create initial clusters with only depots
@@ -68,11 +45,21 @@ class Scenario:
             cluster.customers.append(c)
 
     def createClusterRoutes(self):
+        if self.pdata.params.useRoutePool:
+            # pad with an always present entry, see RoutePool.createRoutes
+            present = np.append(self.present, True)
+            for c in self.clusterList:
+                for vt in self.pdata.vehicleTypes:
+                    c.selectRoutes(self.pdata.routePools[c.depot.id][vt.type], present)
+            return
+
         for c in self.clusterList:
             for vt in self.pdata.vehicleTypes:
                 c.createRoutes(vt.type)
 
     def plotClusters(self):
+        import matplotlib.pyplot as plt
+
         colors = ["y", "r", "c", "m", "b"]
         cont = 0
 
@@ -1,8 +1,8 @@
 import os
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
-
 class ProblemSolution:
+    statsFileName = "output/stats.csv"
+
     def __init__(self):
         self.pdata = None
         self.instanceName = ""
@@ -11,6 +11,13 @@ class ProblemSolution:
         self.elapsedTime = 0
         self.o_cuts = 0
         self.f_cuts = 0
+        self.subproblems = 0
+        self.distinctSubproblems = 0
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.subproblemTime = 0
+        self.tableTime = 0
+        self.tableEntries = 0
 
     def initialize(self, pdata):
         self.pdata = pdata
@@ -26,31 +33,61 @@ class ProblemSolution:
                 self.leasedFleet[d.id][vt.type] = 0
                 self.hiredFleet[d.id][vt.type] = 0
 
-    def saveToFile(self):
-        # Save stats file
-        statsFileName = "output/stats.csv"
-        f = open(statsFileName, "a")
-
-        # Write stats csv header if needed.
-        header = "Instance;Customers;Depots;VTypes;Shifts;Scenarios;Obj;O_Cuts;F_Cuts;Callbacks;Time(s)"
-
-        if os.stat(statsFileName).st_size == 0:
-            f.write(header + "\n")
-
-        # write stats data
-        f.write(self.instanceName + ";")
-        f.write(str(self.pdata.n) + ";")
-        f.write(str(len(self.pdata.depots)) + ";")
-        f.write(str(len(self.pdata.vehicleTypes)) + ";")
-        f.write(str(self.pdata.shifts) + ";")
-        f.write(str(params.numberOfScenariosPerShift) + ";")
-        f.write("{:.2f}".format(self.obj).replace(".",",") + ";")
-        f.write(str(self.o_cuts) + ";")
-        f.write(str(self.f_cuts) + ";")
-        f.write(str(self.callbacks) + ";")
-        f.write("{:.2f}".format(self.elapsedTime).replace(".",",") + "\n")
-
-        f.close()
+    def getDedupRatio(self):
+        # subproblems per distinct subproblem model
+        if self.distinctSubproblems == 0:
+            return 0.0
+        return self.subproblems / float(self.distinctSubproblems)
+
+    def getSavedTime(self):
+        # subproblem solve time avoided by the result cache, at the mean time of a solve
+        if self.cacheMisses == 0:
+            return 0.0
+        return self.cacheHits * self.subproblemTime / self.cacheMisses
+
+    def saveToFile(self, statsLock=None):
+        # build the stats line first so it is appended with a single write
+        line = self.instanceName + ";"
+        line += str(self.pdata.n) + ";"
+        line += str(len(self.pdata.depots)) + ";"
+        line += str(len(self.pdata.vehicleTypes)) + ";"
+        line += str(self.pdata.shifts) + ";"
+        line += str(self.pdata.params.numberOfScenariosPerShift) + ";"
+        line += "{:.2f}".format(self.obj).replace(".",",") + ";"
+        line += str(self.o_cuts) + ";"
+        line += str(self.f_cuts) + ";"
+        line += str(self.callbacks) + ";"
+        line += "{:.2f}".format(self.elapsedTime).replace(".",",") + ";"
+        line += str(self.subproblems) + ";"
+        line += str(self.distinctSubproblems) + ";"
+        line += "{:.2f}".format(self.getDedupRatio()).replace(".",",") + ";"
+        line += str(self.cacheHits) + ";"
+        line += str(self.cacheMisses) + ";"
+        line += "{:.2f}".format(self.subproblemTime).replace(".",",") + ";"
+        line += "{:.2f}".format(self.getSavedTime()).replace(".",",") + ";"
+        line += "{:.2f}".format(self.tableTime).replace(".",",") + ";"
+        line += str(self.tableEntries) + "\n"
+
+        # Save stats file, several batch workers may append to it at the same time
+        if statsLock is not None:
+            statsLock.acquire()
+        try:
+            f = open(ProblemSolution.statsFileName, "a")
+
+            # Write stats csv header if needed.
+            header = "Instance;Customers;Depots;VTypes;Shifts;Scenarios;Obj;O_Cuts;F_Cuts;Callbacks;Time(s);" \
+                     "Subproblems;DistinctSubproblems;DedupRatio;CacheHits;CacheMisses;SPTime(s);SPTimeSaved(s);" \
+                     "TableTime(s);TableEntries"
+
+            if os.stat(ProblemSolution.statsFileName).st_size == 0:
+                f.write(header + "\n")
+
+            # write stats data
+            f.write(line)
+            f.close()
+        finally:
+            if statsLock is not None:
+                statsLock.release()
 
         # Write sol file
         solFileName = "output/" + self.instanceName + ".sol.csv"
@@ -2,19 +2,17 @@ from __future__ import division
 
 import cplex
 import numpy as np
-import matplotlib.pyplot as plt
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
-from src.vrp.svrp.inputdata.ProblemData import ProblemData
 from src.vrp.svrp.solver.Variable import Variable
 from src.vrp.svrp.solver.Constraint import Constraint
 from src.vrp.svrp.solver.Model import Model
-from src.vrp.svrp.solver.SVRPLazyCallback import SVRPLazyCallback
+from src.vrp.svrp.solver.SVRPCallback import SPSolver, SVRPLazyCallback
 
 
 class BendersCBSolver:
-    def __init__(self):
-        self.pdata = ProblemData()
+    def __init__(self, pdata):
+        self.pdata = pdata
+        self.params = pdata.params
         self.master = Model()
 
     def createMaster(self):
@@ -30,6 +28,7 @@ class BendersCBSolver:
         self.minimumFleetSizeConstraints(self.master)
         self.maximumFleetSizeConstraints(self.master)
         self.createAlphaConstraints(self.master)
+        self.master.flush()
         # self.master.lp.write("lps\\svrpCB_master.lp")
 
     def createNVariables(self, model):
@@ -39,17 +38,18 @@ class BendersCBSolver:
                     v = Variable()
                     v.type = Variable.v_n
                     v.name = model.getName("n", d.id, i, vt.type)
-                    v.col = model.numCols
                     v.depot = d
                     v.digit = i
                     v.vehicleType = vt
-                    model.variables[v.name] = v
-                    model.lp.variables.add(obj=[i * self.pdata.depotCosts[d.id][vt.type]], types=["B"], names=[v.name])
-                    model.numCols += 1
+                    model.addVariable(v, i * self.pdata.depotCosts[d.id][vt.type], "B")
 
     def createAlphaVariables(self, model):
+        # the aggregated cut modes bound alphaH or alphaT directly
+        if self.params.cutAggregation != "multi":
+            return
+
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.pdata.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     depot =  cluster.depot
@@ -59,12 +59,17 @@ class BendersCBSolver:
                     v.depot = depot
                     v.shift = i
                     v.scenario = scenario
-                    v.col = model.numCols
-                    model.variables[v.name] = v
-                    model.lp.variables.add(names=[v.name])
-                    model.numCols += 1
+                    model.addVariable(v, 0.0, "C")
 
     def createAlphaHVariables(self, model):
+        # a single cut bounds the expected cost of every shift and depot at once
+        if self.params.cutAggregation == "single":
+            v = Variable()
+            v.type = Variable.v_alphaT
+            v.name = "alphaT"
+            model.addVariable(v, 1.0, "C")
+            return
+
         for t in range(self.pdata.shifts):
             for k, depot in self.pdata.depots.iteritems():
                 v = Variable()
@@ -72,10 +77,7 @@ class BendersCBSolver:
                 v.name = model.getName("alphaH", t, depot.id)
                 v.shift = t
                 v.depot = depot
-                v.col = model.numCols
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[1.0], names=[v.name])
-                model.numCols += 1
+                model.addVariable(v, 1.0, "C")
 
     #endregion
 
@@ -92,7 +94,6 @@ class BendersCBSolver:
             c.type = Constraint.c_minFleet
             c.name = model.getName("minFleet", vt.type)
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -103,9 +104,7 @@ class BendersCBSolver:
                     mind.append(nvar.col)
                     mval.append(nvar.digit)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "G", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "G", rhs)
 
     def maximumFleetSizeConstraints(self, model):
         for vt in self.pdata.vehicleTypes:
@@ -115,7 +114,6 @@ class BendersCBSolver:
             c.type = Constraint.c_maxFleet
             c.name = model.getName("maxFleet", vt.type)
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -126,11 +124,12 @@ class BendersCBSolver:
                     mind.append(nvar.col)
                     mval.append(nvar.digit)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "L", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "L", rhs)
 
     def createAlphaConstraints(self, model):
+        if self.params.cutAggregation != "multi":
+            return
+
         for t in range(self.pdata.shifts):
             for k, depot in self.pdata.depots.iteritems():
                 c = Constraint()
@@ -138,7 +137,6 @@ class BendersCBSolver:
                 c.name = model.getName("c_alpha", t, depot.id)
                 c.depot = depot
                 c.shift = t
-                c.row = model.numRows
 
                 mind = []
                 mval = []
@@ -150,14 +148,12 @@ class BendersCBSolver:
                 mval.append(1.0)
 
                 # get the ohter alpha variables
-                for i in range(params.numberOfScenariosPerShift):
+                for i in range(self.params.numberOfScenariosPerShift):
                     alpha2 = model.getVariable(model.getName("alpha", t, i, depot.id))
                     mind.append(alpha2.col)
-                    mval.append(-1/params.numberOfScenariosPerShift)
+                    mval.append(-1/self.params.numberOfScenariosPerShift)
 
-                model.constraints[c.name] = c
-                model.createConstraint(mind, mval, "E", rhs, c.name)
-                model.numRows += 1
+                model.addConstraint(c, mind, mval, "E", rhs)
 
     def createSingleVarDepotConstraint(self, model):
         for vt in self.pdata.vehicleTypes:
@@ -167,7 +163,6 @@ class BendersCBSolver:
                 c.name = model.getName("singleVar", depot.id, vt.type)
                 c.depot = depot
                 c.vehicleType = vt
-                c.row = model.numRows
 
                 mind = []
                 mval = []
@@ -179,28 +174,29 @@ class BendersCBSolver:
                     mind.append(nvar.col)
                     mval.append(1.0)
 
-                model.constraints[c.name] = c
-                model.createConstraint(mind, mval, "E", rhs, c.name)
-                model.numRows += 1
+                model.addConstraint(c, mind, mval, "E", rhs)
     #endregion
 
     def solve(self):
         # create the master problem
         self.createMaster()
-        self.pdata.master = self.master
         lp = self.master.lp
 
         # need to use traditional branch-and-cut to allow for control callbacks
         # lp.parameters.preprocessing.presolve.set(lp.parameters.preprocessing.presolve.values.off)
-        lp.parameters.threads.set(1)
+        # the callbacks can run in parallel, they share the subproblem solver under a lock
+        lp.parameters.threads.set(self.params.numMasterThreads)
         # lp.parameters.advance.set(0)
         # lp.parameters.mip.strategy.search.set(lp.parameters.mip.strategy.search.values.traditional)
 
-        # Register the lazy cut callback
-        lp.register_callback(SVRPLazyCallback)
+        # Register the lazy cut callback, it evaluates the subproblems of this instance
+        spSolver = SPSolver(self.pdata, self.master)
+        callback = lp.register_callback(SVRPLazyCallback)
+        callback.initialize(self.pdata, spSolver)
 
         # solve the model
         lp.solve()
+        spSolver.close()
 
         solution = self.master.lp.solution
         status = solution.get_status()
@@ -222,9 +218,14 @@ class BendersCBSolver:
 
 
         print "**********************Resultado Final***********", str(obj)
+        ps = self.pdata.problemSolution
+        print "Subproblem cache: %d hits | %d misses | %.2f (s) solving | ~%.2f (s) saved" % \
+              (ps.cacheHits, ps.cacheMisses, ps.subproblemTime, ps.getSavedTime())
 
 
     def plotShiftSolution(self, scenario, routes):
+        import matplotlib.pyplot as plt
+
         # create new plot
         fig = plt.figure()
         fig.suptitle('Shift:' + str(scenario.shift) + " - Scenario:" + str(scenario.id) , fontsize=20)
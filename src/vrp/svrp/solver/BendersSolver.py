@@ -1,30 +1,43 @@
 from __future__ import division
 
+import math
 import time
 import cplex
 import numpy as np
-import matplotlib.pyplot as plt
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
-from src.vrp.svrp.inputdata.ProblemData import ProblemData
 from src.vrp.svrp.inputdata.Scenario import Scenario
 from src.vrp.svrp.solver.Variable import Variable
 from src.vrp.svrp.solver.Constraint import Constraint
 from src.vrp.svrp.solver.Model import Model
+from src.vrp.svrp.solver.CutPool import CutPool
+from src.vrp.svrp.solver.SVRPCallback import SPSolver
 
 class BendersSolver:
-    def __init__(self):
-        self.pdata = ProblemData()
+    def __init__(self, pdata):
+        self.pdata = pdata
+        self.params = pdata.params
         self.master = Model()
-        self.subproblems = {}
+        self.spSolver = None
+        self.cutPool = None
+        self.nCols = []
+        self.evaluatedFleets = set()
+        self.modelSubproblems = []
 
         self.f_cons = 0
         self.o_cons = 0
 
-        self.fname = "output/" + self.pdata.instanceName + "_regularBenders.log"
+        # runs with other cuts get their own logs so they can be compared
+        cuts = "" if self.params.optimalityCuts == "nogood" else "_" + self.params.optimalityCuts
+        if self.params.cutAggregation != "multi":
+            cuts += "_" + self.params.cutAggregation
+        if self.params.stabilization != "none":
+            cuts += "_" + self.params.stabilization
+        if self.params.asyncBenders:
+            cuts += "_async"
+        self.fname = "output/" + self.pdata.instanceName + "_regularBenders" + cuts + ".log"
 
         f = open(self.fname + ".csv", "w")
-        header = "Iterations; Zinf; Zsup; MinZsup; O_Cuts; F_Cuts; Time (s)\n"
+        header = "Iterations; Zinf; Zsup; MinZsup; O_Cuts; F_Cuts; Time (s); Master (s); Fleets; Radius; Pool; Duplicates; Purged; Restored\n"
         f.write(header)
         f.close()
 
@@ -55,27 +68,20 @@ class BendersSolver:
         self.minimumFleetSizeConstraints(self.master)
         self.maximumFleetSizeConstraints(self.master)
         self.createAlphaConstraints(self.master)
+        self.createTrustRegionConstraint(self.master)
+        self.master.flush()
+
+        # the cuts go through the pool
+        self.cutPool = CutPool(self.master, self.params.cutPurgeAge)
         # self.master.lp.write("lps\\svrp_master.lp")
 
     def createSubproblems(self):
-        self.subproblems = {}
-
-        # create a subproblem for each shift, depot, scenario
-        for t in range(self.pdata.shifts):
-            self.subproblems[t] = {}
-            for i in range(params.numberOfScenariosPerShift):
-                self.subproblems[t][i] = {}
-                scenario = self.pdata.scenarios[t][i]
-                for cluster in scenario.clusterList:
-                    d = cluster.depot
-                    sp = self.subproblems[t][i][d.id] = Model()
+        # the subproblems are shared with the branch-and-cut solver
+        self.spSolver = SPSolver(self.pdata, self.master)
 
-                    # set the objective of the subproblem
-                    sp.lp.objective.set_sense(sp.lp.objective.sense.minimize)
-                    self.createXYVariables(sp, t, scenario, cluster)
-                    self.fleetSizeConstraints(sp, t, scenario, cluster, 0)
-                    self.customerSatisfactionConstraints(sp, t, scenario, cluster)
-                    # sp.lp.write("lps\\svrp_subproblem_" + str(t) + "_" + str(i) + "_" + str(d.id) + ".lp")
+        # every "n" column of the master, the part of its solutions given as mip starts
+        registry = self.spSolver.registry
+        self.nCols = [int(j) for cols in registry.nCols for c in cols for j in c]
 
     def createNVariables(self, model):
         for vt in self.pdata.vehicleTypes:
@@ -84,17 +90,18 @@ class BendersSolver:
                     v = Variable()
                     v.type = Variable.v_n
                     v.name = model.getName("n", d.id, i, vt.type)
-                    v.col = model.numCols
                     v.depot = d
                     v.digit = i
                     v.vehicleType = vt
-                    model.variables[v.name] = v
-                    model.lp.variables.add(obj=[i * self.pdata.depotCosts[d.id][vt.type]], types=["B"], names=[v.name])
-                    model.numCols += 1
+                    model.addVariable(v, i * self.pdata.depotCosts[d.id][vt.type], "B")
 
     def createAlphaVariables(self, model):
+        # the aggregated cut modes bound alphaH or alphaT directly
+        if self.params.cutAggregation != "multi":
+            return
+
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.pdata.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     depot =  cluster.depot
@@ -104,12 +111,17 @@ class BendersSolver:
                     v.depot = depot
                     v.shift = i
                     v.scenario = scenario
-                    v.col = model.numCols
-                    model.variables[v.name] = v
-                    model.lp.variables.add(names=[v.name])
-                    model.numCols += 1
+                    model.addVariable(v, 0.0, "C")
 
     def createAlphaHVariables(self, model):
+        # a single cut bounds the expected cost of every shift and depot at once
+        if self.params.cutAggregation == "single":
+            v = Variable()
+            v.type = Variable.v_alphaT
+            v.name = "alphaT"
+            model.addVariable(v, 1.0, "C")
+            return
+
         for t in range(self.pdata.shifts):
             for k, depot in self.pdata.depots.iteritems():
                 v = Variable()
@@ -117,48 +129,7 @@ class BendersSolver:
                 v.name = model.getName("alphaH", t, depot.id)
                 v.shift = t
                 v.depot = depot
-                v.col = model.numCols
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[1.0], names=[v.name])
-                model.numCols += 1
-
-    def createXYVariables(self, model, shift, scenario, cluster):
-        for vt in self.pdata.vehicleTypes:
-            if vt.type not in cluster.routes:
-                continue
-
-            for route in cluster.routes[vt.type]:
-                # Create x variable
-                v = Variable()
-                v.type = Variable.v_x
-                v.name = model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                v.col = model.numCols
-                v.shift = shift
-                v.scenario = scenario
-                v.depot = cluster.depot
-                v.route = route
-                v.vehicleType = vt
-
-                coef = vt.lvCost * route.distance
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
-                model.numCols += 1
-
-                # Create y variable
-                v = Variable()
-                v.type = Variable.v_y
-                v.name = model.getName("y", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                v.col = model.numCols
-                v.shift = shift
-                v.scenario = scenario
-                v.depot = cluster.depot
-                v.route = route
-                v.vehicleType = vt
-
-                coef = vt.hvCost * route.distance
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
-                model.numCols += 1
+                model.addVariable(v, 1.0, "C")
 
     #endregion
 
@@ -175,7 +146,6 @@ class BendersSolver:
             c.type = Constraint.c_minFleet
             c.name = model.getName("minFleet", vt.type)
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -186,9 +156,7 @@ class BendersSolver:
                     mind.append(nvar.col)
                     mval.append(nvar.digit)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "G", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "G", rhs)
 
     def maximumFleetSizeConstraints(self, model):
         for vt in self.pdata.vehicleTypes:
@@ -198,7 +166,6 @@ class BendersSolver:
             c.type = Constraint.c_maxFleet
             c.name = model.getName("maxFleet", vt.type)
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -209,11 +176,12 @@ class BendersSolver:
                     mind.append(nvar.col)
                     mval.append(nvar.digit)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "L", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "L", rhs)
 
     def createAlphaConstraints(self, model):
+        if self.params.cutAggregation != "multi":
+            return
+
         for t in range(self.pdata.shifts):
             for k, depot in self.pdata.depots.iteritems():
                 c = Constraint()
@@ -221,7 +189,6 @@ class BendersSolver:
                 c.name = model.getName("c_alpha", t, depot.id)
                 c.depot = depot
                 c.shift = t
-                c.row = model.numRows
 
                 mind = []
                 mval = []
@@ -233,77 +200,47 @@ class BendersSolver:
                 mval.append(1.0)
 
                 # get the ohter alpha variables
-                for i in range(params.numberOfScenariosPerShift):
+                for i in range(self.params.numberOfScenariosPerShift):
                     alpha2 = model.getVariable(model.getName("alpha", t, i, depot.id))
                     mind.append(alpha2.col)
-                    mval.append(-1/params.numberOfScenariosPerShift)
+                    mval.append(-1/self.params.numberOfScenariosPerShift)
 
-                model.constraints[c.name] = c
-                model.createConstraint(mind, mval, "E", rhs, c.name)
-                model.numRows += 1
+                model.addConstraint(c, mind, mval, "E", rhs)
 
 
-    def fleetSizeConstraints(self, model, shift, scenario, cluster, nval):
-        for vt in self.pdata.vehicleTypes:
-            if vt.type not in cluster.routes:
-                continue
-            c = Constraint()
-            c.type = Constraint.c_fleetSize
-            c.name = model.getName("fleetSize", shift, scenario.id, cluster.depot.id, vt.type)
-            c.shift = shift
-            c.scenario = scenario
-            c.depot = cluster.depot.id
-            c.vehicleType = vt
-            c.row = model.numRows
+    def createTrustRegionConstraint(self, model):
+        # local branching row of the stabilization, it starts inactive and is
+        # centered on the best fleet once there is one (see setTrustRegion)
+        if self.params.stabilization != "trustregion":
+            return
 
-            mind = []
-            mval = []
-            rhs = nval
+        c = Constraint()
+        c.type = Constraint.c_trustRegion
+        c.name = "trustRegion"
 
-            for route in cluster.routes[vt.type]:
-                # get the x variable and add it to the constraint
-                xname = model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                xvar = model.getVariable(xname)
-                mind.append(xvar.col)
-                mval.append(1.0)
+        mind = []
+        mval = []
+        for vt in self.pdata.vehicleTypes:
+            for key, depot in self.pdata.depots.iteritems():
+                for i in range(vt.maxFleet + 1):
+                    nvar = model.getVariable(model.getName("n", depot.id, i, vt.type))
+                    mind.append(nvar.col)
+                    mval.append(1.0)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "L", rhs, c.name)
-            model.numRows += 1
+        model.addConstraint(c, mind, mval, "L", len(mind))
 
-    def customerSatisfactionConstraints(self, model, shift, scenario, cluster):
-        for customer in cluster.customers:
-            c = Constraint()
-            c.type = Constraint.c_demand
-            c.name = model.getName("demand", shift, scenario.id, cluster.depot.id)
-            c.row = model.numRows
+    def setTrustRegion(self, center, radius):
+        # at most radius "n" columns may differ from the center, no center drops the region
+        row = self.master.getConstraint("trustRegion").row
+        if center is None:
+            coefs = [(row, j, 1.0) for j in self.nCols]
+            self.master.lp.linear_constraints.set_coefficients(coefs)
+            self.master.changeRHS(row, len(self.nCols))
+            return
 
-            mind = []
-            mval = []
-            rhs = 1.0
-
-            for vt in self.pdata.vehicleTypes:
-                if vt.type not in cluster.routes:
-                    continue
-
-                for route in cluster.routes[vt.type]:
-                    # check if customer c belongs in this route
-                    if customer in route.customers:
-                        # add the x variable
-                        xname = model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                        xvar = model.getVariable(xname)
-                        mind.append(xvar.col)
-                        mval.append(1.0)
-
-                        # add the y variable
-                        yname = model.getName("y", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                        yvar = model.getVariable(yname)
-                        mind.append(yvar.col)
-                        mval.append(1.0)
-
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "E", rhs, c.name)
-            model.numRows += 1
+        coefs = [(row, self.nCols[j], -1.0 if center[j] > 0.5 else 1.0) for j in range(len(self.nCols))]
+        self.master.lp.linear_constraints.set_coefficients(coefs)
+        self.master.changeRHS(row, radius - sum(center))
 
     def createSingleVarDepotConstraint(self, model):
         for vt in self.pdata.vehicleTypes:
@@ -313,7 +250,6 @@ class BendersSolver:
                 c.name = model.getName("singleVar", depot.id, vt.type)
                 c.depot = depot
                 c.vehicleType = vt
-                c.row = model.numRows
 
                 mind = []
                 mval = []
@@ -325,78 +261,107 @@ class BendersSolver:
                     mind.append(nvar.col)
                     mval.append(1.0)
 
-                model.constraints[c.name] = c
-                model.createConstraint(mind, mval, "E", rhs, c.name)
-                model.numRows += 1
+                model.addConstraint(c, mind, mval, "E", rhs)
 
-    def createFeasibilityCut(self, depot):
+    def createFeasibilityCut(self, k):
+        # k is the position of the subproblem in the index registry
         c = Constraint()
         c.type = Constraint.c_feasibility
-        c.name = self.master.getName("feasibility", self.f_cons)
-        c.row = self.master.numRows
+        c.depot = self.spSolver.registry.spDepot[k]
 
-        mind = []
-        mval = []
-        rhs = 0
+        mind, mval, rhs = self.spSolver.getFeasibilityCut(k)
+        if self.cutPool.addCut(c, mind, mval, "L", rhs):
+            self.f_cons += 1
 
-        for vt in self.pdata.vehicleTypes:
-            for i in range(vt.maxFleet + 1):
-                nvar = self.master.getVariable(self.master.getName("n", depot.id, i, vt.type))
+    def createOptimalityCut(self, k, mind, mval, rhs):
+        # k is the position of the (first) subproblem of the cut in the index registry
+        registry = self.spSolver.registry
+        mode = self.params.cutAggregation
+        c = Constraint()
+        c.type = Constraint.c_optimality
+        if mode != "single":
+            c.shift = registry.spShift[k]
+            c.depot = registry.spDepot[k]
+        if mode == "multi":
+            c.scenario = registry.spScenario[k]
 
-                # check if the variable is in the current master solution
-                if nvar.solutionVal != 0:
-                    rhs += 1
-                    mind.append(nvar.col)
-                    mval.append(1.0)
+        if self.cutPool.addCut(c, mind, mval, "G", rhs):
+            self.o_cons += 1
 
-        self.master.constraints[c.name] = c
-        self.master.createConstraint(mind, mval, "L", rhs - 1, c.name)
-        self.master.numRows += 1
-        self.f_cons += 1
+    #endregion
 
-    def createOptimalityCut(self, shift, scenario, depot, cost):
-        c = Constraint()
-        c.type = Constraint.c_optimality
-        c.name = self.master.getName("optimality", self.o_cons)
-        c.shift = shift
-        c.depot = depot
-        c.scenario = scenario
-        c.row = self.master.numRows
+    def getPoolFleets(self, solution, fleet):
+        # master values of the best pool solutions whose fleets are new, besides the
+        # fleet of the optimal solution, at most masterPoolFleets - 1 of them
+        pool = solution.pool
+        count = self.params.masterPoolFleets - 1
+        if count <= 0 or pool.get_num() <= 1:
+            return []
+
+        order = sorted(range(pool.get_num()), key=pool.get_objective_value)
+        seen = set([tuple(fleet)])
+        fleets = []
+        for i in order:
+            sol = pool.get_values(i)
+            key = tuple([round(sol[j]) for j in self.nCols])
+            if key in seen or key in self.evaluatedFleets:
+                continue
+            seen.add(key)
+            fleets.append(sol)
+            if len(fleets) == count:
+                break
 
-        mind = []
-        mval = []
-        contVars = 0
+        return fleets
 
-        # get the alpha variable
-        alpha = self.master.getVariable(self.master.getName("alpha", shift, scenario.id, depot.id))
-        mind.append(alpha.col)
-        mval.append(1.0)
+    def evaluateFleet(self, sol):
+        # solves the subproblems with the fleet of a master solution and adds their
+        # cuts, returns its upper bound and whether a subproblem was infeasible
+        self.evaluatedFleets.add(tuple([round(sol[j]) for j in self.nCols]))
+        infeasible = False
+        nvals, zsup = self.spSolver.getFleetValues(sol)
 
-        #get the "N" variables
-        for vt in self.pdata.vehicleTypes:
-            for i in range(vt.maxFleet + 1):
-                nvar = self.master.getVariable(self.master.getName("n", depot.id, i, vt.type))
+        # Run each subproblem with the updated n values of the trial solution
+        self.spSolver.evaluate(nvals)
 
-                # check if the variable is part of the current master solution
-                if nvar.solutionVal != 0:
-                    contVars += 1
-                    mind.append(nvar.col)
-                    mval.append(-cost)
+        # and add the proper feasibility and optimality cuts
+        cuts = []
+        for k in range(len(self.spSolver.results)):
+            status, sp_obj, hired = self.spSolver.results[k]
 
-        contVars -= 1
-        self.master.constraints[c.name] = c
-        self.master.createConstraint(mind, mval, "G",cost*-contVars , c.name)
-        self.master.numRows += 1
-        self.o_cons += 1
+            if status in [101,102]: # feasible
+                # add the objective value
+                zsup += (1/self.params.numberOfScenariosPerShift) * sp_obj
 
-    #endregion
+                # create optimality cut in the master problem
+                cuts.append((k,) + self.spSolver.getOptimalityCut(k, sp_obj))
+
+            elif status in [103]: # infeasible
+                infeasible = True
+
+                # create an infeasiblity cut in the master problem
+                self.createFeasibilityCut(k)
+            else:
+                pass
+
+        # the optimality cuts are summed per master column when they are aggregated
+        for k, mind, mval, rhs in self.spSolver.mergeCuts(cuts):
+            self.createOptimalityCut(k, mind, mval, rhs)
+
+        return zsup, infeasible
 
     def solve(self):
+        # create the master problem
+        self.createMaster()
+
         # create subproblems
         self.createSubproblems()
 
-        # create the master problem
-        self.createMaster()
+        # the pipelined loop needs the subproblem workers to overlap with the master
+        if self.params.asyncBenders:
+            if self.spSolver.pool is not None and self.spSolver.valueTables is None:
+                return self.solveAsync()
+            print "Asynchronous Benders needs subproblem workers and no value tables, solving synchronously"
+
         zinf = -10000000000000
         zsup = 10000000000000
         minZsup = 10000000000000
@@ -404,118 +369,232 @@ class BendersSolver:
         iter = 0
         initTime = time.time()
 
+        # n values of the last master solution and of the one with the best upper bound
+        lastStart = None
+        bestStart = None
+
+        # the trust region stays until it has grown past the number of "n" columns that can differ
+        stabilized = self.params.stabilization == "trustregion"
+        radius = self.params.trustRegionRadius
+        maxRadius = 2 * len(self.pdata.depots) * len(self.pdata.vehicleTypes)
+        inRegion = False
+
         # Benders algorithm
-        while infeasible or zsup - zinf > params.eps:
+        while infeasible or zsup - zinf > self.params.eps or inRegion:
             iter += 1
 
+            # center the trust region on the best fleet, zinf is only a local bound within it
+            inRegion = stabilized and bestStart is not None
+            if inRegion:
+                self.setTrustRegion(bestStart, radius)
+            bestZsup = minZsup
+
             infeasible = False
             zsup = 0
 
-            # write the master lp
-            # self.master.lp.write("lps\\svrp_master.lp")
-
-            # solve the (updated) master problem
-            # print "Solving master problem... "
-            self.master.lp.solve()
-
-            # get the trial solution
-            solution = self.master.lp.solution
+            # solve the (updated) master problem and get the trial solution
+            solution, masterTime = self.solveMaster(lastStart, bestStart)
             sol = solution.get_values()
             zinf = solution.get_objective_value()
+            lastStart = [round(sol[j]) for j in self.nCols]
 
-            nvals = {}
-
-            for key, d in self.pdata.depots.iteritems():
-                nvals[d.id] = {}
-                for vt in self.pdata.vehicleTypes:
-                    nvals[d.id][vt.type] = 0
-
-                    for i in range(vt.maxFleet + 1):
-                        nvar = self.master.getVariable(self.master.getName("n", d.id, i, vt.type))
-                        nvar.solutionVal = sol[nvar.col]
-                        zsup += (nvar.digit * nvar.solutionVal) * self.pdata.depotCosts[d.id][vt.type]
-
-                        nvals[d.id][vt.type] += (nvar.digit * nvar.solutionVal)
-
-            # Run each subproblem with the updated n values of the trial solution
-            # and add the proper feasibility and optimality cuts
-            for t in range(self.pdata.shifts):
-                for i in range(params.numberOfScenariosPerShift):
-                    scenario = self.pdata.scenarios[t][i]
-                    for cluster in scenario.clusterList:
-                        depot = cluster.depot
-
-                        # Get the subproblem
-                        sp = self.subproblems[t][i][depot.id]
-
-                        for vt in self.pdata.vehicleTypes:
-                            # change the rhs of the fleet size constraint with the value obtained from the master
-                            nval = nvals[depot.id][vt.type]
-                            c = sp.getConstraint(sp.getName("fleetSize", t, i, depot.id, vt.type))
-                            if not c is None: # there might be no demands for a depot in a given cenario.
-                                sp.changeRHS(c.row, nval)
-
-                        # write the subproblem lp file
-                        # sp.lp.write("lps\\svrp_subproblem.lp")
-
-                        # solve the subproblem
-                        sp.lp.solve()
-
-                        # get the subproblem status
-                        sp_sol = sp.lp.solution
-                        status = sp_sol.get_status()
-
-                        if status in [101,102]: # feasible
-                            # add the objective value
-                            sp_obj = sp_sol.get_objective_value()
-                            zsup += (1/params.numberOfScenariosPerShift) * sp_obj
-
-                            # create optimality cut in the master problem
-                            self.createOptimalityCut(t, scenario, depot, sp_obj)
-
-                        elif status in [103]: # infeasible
-                            infeasible = True
-
-                            # create an infeasiblity cut in the master problem
-                            self.createFeasibilityCut(depot)
-                        else:
-                            pass
-                            # print "shift: ", str(t), " | scenario: ", str(i), " | depot: ", str(depot.id)
+            # age the cuts with this solution and drop the ones that stay slack
+            self.cutPool.update(solution)
+            self.cutPool.purge()
 
+            zsup, infeasible = self.evaluateFleet(sol)
+            if not infeasible and zsup < minZsup:
+                bestStart = lastStart
             minZsup = min(minZsup, zsup)
-            currentTime = time.time()
-            elapsed = currentTime - initTime
 
-            s_iter = str(iter)
-            s_zinf = "{:.2f}".format(zinf).replace(".",",")
-            s_zsup = "{:.2f}".format(zsup).replace(".",",")
-            s_incumbent = "{:.2f}".format(minZsup).replace(".",",")
-            s_ocons = str(self.o_cons)
-            s_fcons = str(self.f_cons)
-            s_elapsed = "{:.2f}".format(elapsed).replace(".",",")
+            # the other fleets of the solution pool only add cuts and may improve the upper bound
+            poolFleets = self.getPoolFleets(solution, lastStart)
+            for poolSol in poolFleets:
+                poolZsup, poolInfeasible = self.evaluateFleet(poolSol)
+                if not poolInfeasible and poolZsup < minZsup:
+                    bestStart = [round(poolSol[j]) for j in self.nCols]
+                    minZsup = poolZsup
+
+            # add all the cuts of this iteration to the master at once
+            self.master.flush()
+
+            # nothing in the region beats the best fleet, widen it and drop it once it covers every fleet
+            if inRegion and zinf >= bestZsup - self.params.eps:
+                radius *= 2
+                if radius >= maxRadius:
+                    stabilized = False
+                    self.setTrustRegion(None, radius)
+            elapsed = time.time() - initTime
+            self.logIteration(iter, zinf, zsup, minZsup, elapsed, masterTime,
+                              1 + len(poolFleets), str(radius) if inRegion else "-")
+
+        self.finish(zinf, zsup, iter, initTime)
+
+    def solveAsync(self):
+        # pipelined Benders: each master fleet goes to the subproblem workers without
+        # waiting for the sweeps still running, the cuts enter the master as the worker
+        # answers arrive and the master is solved again once asyncMinShare of the workers
+        # answered for the newest fleet. Every master objective is a valid lower bound and
+        # only complete sweeps give upper bounds, so the stopping test stays exact.
+        pool = self.spSolver.pool
+        registry = self.spSolver.registry
+        self.modelSubproblems = [[] for m in range(registry.getNumModels())]
+        for k in range(registry.getNumSubproblems()):
+            self.modelSubproblems[registry.spModel[k]].append(k)
+        need = max(1, int(math.ceil(self.params.asyncMinShare * pool.numWorkers)))
 
-            line = s_iter + ";" + s_zinf + ";" + \
-                   s_zsup + ";" + s_incumbent + \
-                   ";" + s_ocons + ";" + s_fcons + ";" + s_elapsed
+        zinf = -10000000000000
+        zsup = 10000000000000
+        minZsup = 10000000000000
+        iter = 0
+        tag = 0
+        initTime = time.time()
+        lastStart = None
+        bestStart = None
 
-            s_formatted = "Iter: %s | Zinf: %s | Zsup: %s | minZsup: %s | O_Cuts: %s | FCuts: %s | Time: %s (s)" \
-                  % (s_iter, s_zinf, s_zsup, s_incumbent, s_ocons, s_fcons, s_elapsed)
+        # fleets in flight by tag, with their partial upper bound and the worker answers so far
+        fleets = {}
 
-            # print to screen
-            print s_formatted
+        while minZsup - zinf > self.params.eps:
+            iter += 1
+            solution, masterTime = self.solveMaster(lastStart, bestStart)
+            sol = solution.get_values()
+            zinf = max(zinf, solution.get_objective_value())
+            lastStart = [round(sol[j]) for j in self.nCols]
+
+            self.cutPool.update(solution)
+            self.cutPool.purge()
+
+            # a fleet that is still in flight is not sent again, the master waits for its cuts
+            newest = None
+            inFlight = [fleet["start"] for fleet in fleets.itervalues()]
+            if minZsup - zinf > self.params.eps and lastStart not in inFlight:
+                nvals, zfleet = self.spSolver.getFleetValues(sol)
+                tag += 1
+                fleets[tag] = {"start": lastStart, "zsup": zfleet, "infeasible": False, "answers": 0,
+                               "cols": (self.spSolver.selectedCols, self.spSolver.dominatedCols), "cuts": []}
+                pool.submit(tag, nvals)
+                newest = tag
+
+            # take in the answers, until enough of them are for the newest fleet or,
+            # when the master repeated a fleet in flight, until any answer arrived
+            while minZsup - zinf > self.params.eps and len(fleets) > 0:
+                for t, results in pool.collect(None):
+                    fleet = fleets[t]
+                    self.addAnswerCuts(fleet, results)
+                    if fleet["answers"] < pool.numWorkers:
+                        continue
+
+                    # a complete sweep, the only source of upper bounds
+                    del fleets[t]
+                    if self.params.cutAggregation != "multi":
+                        for k, mind, mval, rhs in self.spSolver.mergeCuts(fleet["cuts"]):
+                            self.createOptimalityCut(k, mind, mval, rhs)
+                    zsup = fleet["zsup"]
+                    if not fleet["infeasible"] and zsup < minZsup:
+                        minZsup = zsup
+                        bestStart = fleet["start"]
+
+                # add the cuts that arrived to the master at once
+                self.master.flush()
+                if newest not in fleets or fleets[newest]["answers"] >= need:
+                    break
+
+            elapsed = time.time() - initTime
+            self.logIteration(iter, zinf, zsup, minZsup, elapsed, masterTime, len(fleets), "-")
+
+        self.finish(zinf, minZsup, iter, initTime)
+
+    def addAnswerCuts(self, fleet, results):
+        # cuts of the (model, result) answer of one worker for a fleet in flight, they
+        # are built with the "n" columns saved with that fleet. Aggregated cuts wait for
+        # the whole sweep, the sum over one answer is too weak to make the fleet exact.
+        self.spSolver.selectedCols, self.spSolver.dominatedCols = fleet["cols"]
+        cuts = []
+        for m, result in results:
+            status, sp_obj, hired = result
+            for k in self.modelSubproblems[m]:
+                if status in [101,102]: # feasible
+                    fleet["zsup"] += (1/self.params.numberOfScenariosPerShift) * sp_obj
+                    cuts.append((k,) + self.spSolver.getOptimalityCut(k, sp_obj))
+
+                elif status in [103]: # infeasible
+                    fleet["infeasible"] = True
+                    self.createFeasibilityCut(k)
+
+        if self.params.cutAggregation == "multi":
+            for k, mind, mval, rhs in cuts:
+                self.createOptimalityCut(k, mind, mval, rhs)
+        else:
+            fleet["cuts"].extend(cuts)
+        fleet["answers"] += 1
+
+    def solveMaster(self, lastStart, bestStart):
+        # write the master lp
+        # self.master.lp.write("lps\\svrp_master.lp")
 
-            # Update log files
-            f = open(self.fname, "a")
-            f.write(s_formatted + "\n")
-            f.close()
+        # warm start the (updated) master problem from the previous fleets,
+        # cplex drops a start that the new cuts made infeasible
+        if self.params.useMasterMIPStarts and lastStart is not None:
+            starts = [("last", lastStart)]
+            if bestStart is not None and bestStart != lastStart:
+                starts.append(("best", bestStart))
+            self.master.setMIPStarts(self.nCols, starts)
+
+        # print "Solving master problem... "
+        masterTime = time.time()
+        self.master.lp.solve()
+        return self.master.lp.solution, time.time() - masterTime
+
+    def logIteration(self, iter, zinf, zsup, minZsup, elapsed, masterTime, fleets, radius):
+        s_iter = str(iter)
+        s_zinf = "{:.2f}".format(zinf).replace(".",",")
+        s_zsup = "{:.2f}".format(zsup).replace(".",",")
+        s_incumbent = "{:.2f}".format(minZsup).replace(".",",")
+        s_ocons = str(self.o_cons)
+        s_fcons = str(self.f_cons)
+        s_elapsed = "{:.2f}".format(elapsed).replace(".",",")
+        s_master = "{:.2f}".format(masterTime).replace(".",",")
+        s_fleets = str(fleets)
+        s_radius = radius
+        s_pool = str(self.cutPool.getSize())
+        s_duplicates = str(self.cutPool.duplicates)
+        s_purged = str(self.cutPool.purged)
+        s_restored = str(self.cutPool.restored)
+
+        line = s_iter + ";" + s_zinf + ";" + \
+               s_zsup + ";" + s_incumbent + \
+               ";" + s_ocons + ";" + s_fcons + ";" + s_elapsed + ";" + s_master + \
+               ";" + s_fleets + ";" + s_radius + ";" + s_pool + ";" + s_duplicates + ";" + s_purged + ";" + s_restored
+
+        s_formatted = "Iter: %s | Zinf: %s | Zsup: %s | minZsup: %s | O_Cuts: %s | FCuts: %s | Time: %s (s)" \
+                      " | Master: %s (s) | Fleets: %s | Radius: %s | Pool: %s | Dup: %s | Purged: %s | Restored: %s" \
+              % (s_iter, s_zinf, s_zsup, s_incumbent, s_ocons, s_fcons, s_elapsed, s_master, s_fleets, s_radius,
+                 s_pool, s_duplicates, s_purged, s_restored)
+
+        # print to screen
+        print s_formatted
+
+        # Update log files
+        f = open(self.fname, "a")
+        f.write(s_formatted + "\n")
+        f.close()
 
-            f = open(self.fname + ".csv", "a")
-            f.write(line + "\n")
-            f.close()
+        f = open(self.fname + ".csv", "a")
+        f.write(line + "\n")
+        f.close()
 
+    def finish(self, zinf, zsup, iter, initTime):
+        self.spSolver.close()
         print "Final sol: ", zinf, " | ", zsup
+        print "Benders: %d iterations in %.2f (s)" % (iter, time.time() - initTime)
+        ps = self.pdata.problemSolution
+        print "Subproblem cache: %d hits | %d misses | %.2f (s) solving | ~%.2f (s) saved" % \
+              (ps.cacheHits, ps.cacheMisses, ps.subproblemTime, ps.getSavedTime())
 
     def plotShiftSolution(self, scenario, routes):
+        import matplotlib.pyplot as plt
+
         # create new plot
         fig = plt.figure()
         fig.suptitle('Shift:' + str(scenario.shift) + " - Scenario:" + str(scenario.id) , fontsize=20)
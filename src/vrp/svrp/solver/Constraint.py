@@ -8,6 +8,7 @@ class Constraint:
     c_singlevar = 7
     c_alpha = 8
     c_hvfleetSize = 9
+    c_trustRegion = 11
     c_error = 10
 
     def __init__(self):
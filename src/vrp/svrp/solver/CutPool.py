@@ -0,0 +1,108 @@
+import bisect
+
+
+class CutPool:
+    # Benders cuts of a master model. A cut that is already in the model is
+    # dropped, the new ones wait in the model until its next flush() so each
+    # iteration adds its cuts in one call, and the cuts that were not tight in
+    # the last maxAge master solutions are removed from the model (maxAge 0
+    # keeps every cut). A removed cut that is generated again goes back into
+    # the model for good, so every cut is removed at most once and the Benders
+    # loop cannot cycle through the same cuts.
+    def __init__(self, model, maxAge):
+        self.model = model
+        self.maxAge = maxAge
+
+        # cuts in the model, in row order, with their hash key, age and whether they may be removed
+        self.cuts = []
+        self.keys = []
+        self.ages = []
+        self.removable = []
+        self.keySet = set()
+
+        # keys of the removed cuts
+        self.removed = set()
+
+        self.added = 0
+        self.duplicates = 0
+        self.purged = 0
+        self.restored = 0
+
+    def getKey(self, mind, mval, sense, rhs):
+        terms = sorted([(mind[j], round(mval[j], 6)) for j in range(len(mind))])
+        return (tuple(terms), sense, round(rhs, 6))
+
+    def addCut(self, c, mind, mval, sense, rhs):
+        # returns False if the cut is already in the model
+        key = self.getKey(mind, mval, sense, rhs)
+        if key in self.keySet:
+            self.duplicates += 1
+            return False
+
+        restored = key in self.removed
+        if restored:
+            self.removed.discard(key)
+            self.restored += 1
+
+        self.model.addConstraint(c, mind, mval, sense, rhs)
+        self.cuts.append(c)
+        self.keys.append(key)
+        self.ages.append(0)
+        self.removable.append(not restored)
+        self.keySet.add(key)
+        self.added += 1
+        return True
+
+    def update(self, solution):
+        # age of each cut: master solutions since it was last tight
+        if len(self.cuts) == 0:
+            return
+
+        rows = [c.row for c in self.cuts]
+        slacks = solution.get_linear_slacks(rows)
+        for j in range(len(self.cuts)):
+            if abs(slacks[j]) <= 0.000001 * (1 + abs(self.keys[j][2])):
+                self.ages[j] = 0
+            else:
+                self.ages[j] += 1
+
+    def purge(self):
+        # remove the cuts that have been slack for maxAge master solutions
+        if self.maxAge <= 0:
+            return 0
+
+        old = [j for j in range(len(self.cuts)) if self.removable[j] and self.ages[j] >= self.maxAge]
+        if len(old) == 0:
+            return 0
+
+        rows = sorted([self.cuts[j].row for j in old])
+        self.model.deleteRows(rows)
+
+        old = set(old)
+        cuts = []
+        keys = []
+        ages = []
+        removable = []
+        for j in range(len(self.cuts)):
+            if j in old:
+                self.keySet.discard(self.keys[j])
+                self.removed.add(self.keys[j])
+                continue
+
+            # the rows after a deleted one move up
+            c = self.cuts[j]
+            c.row -= bisect.bisect_left(rows, c.row)
+            cuts.append(c)
+            keys.append(self.keys[j])
+            ages.append(self.ages[j])
+            removable.append(self.removable[j])
+
+        self.cuts = cuts
+        self.keys = keys
+        self.ages = ages
+        self.removable = removable
+        self.purged += len(old)
+        return len(old)
+
+    def getSize(self):
+        return len(self.cuts)
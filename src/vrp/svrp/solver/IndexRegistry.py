@@ -0,0 +1,108 @@
+from __future__ import division
+
+import numpy as np
+
+
+class IndexRegistry:
+    # Integer column and row indices of the master and subproblem variables
+    # that are used on every Benders iteration. Names are only resolved once,
+    # when the registry is filled, so the hot loops work with positions and
+    # index arrays only. Depots are numbered in the order of pdata.depotList
+    # and vehicle types in the order of pdata.vehicleTypes.
+    def __init__(self, pdata, master):
+        self.pdata = pdata
+        self.master = master
+        self.numDepots = len(pdata.depotList)
+        self.numVehicleTypes = len(pdata.vehicleTypes)
+
+        self.depotPos = {}
+        for k in range(self.numDepots):
+            self.depotPos[pdata.depotList[k].id] = k
+
+        # master "n" columns, digit and cost of each [depot][vehicle type],
+        # subproblem workers have no master
+        self.nCols = []
+        self.nCosts = []
+        self.nDigits = [np.arange(vt.maxFleet + 1) for vt in pdata.vehicleTypes]
+        for d in (pdata.depotList if master is not None else []):
+            cols = []
+            costs = []
+            for vt in pdata.vehicleTypes:
+                cols.append(np.array([master.getVariable(master.getName("n", d.id, i, vt.type)).col
+                                      for i in range(vt.maxFleet + 1)], dtype=int))
+                costs.append(pdata.depotCosts[d.id][vt.type])
+            self.nCols.append(cols)
+            self.nCosts.append(costs)
+
+        # one entry per (shift, scenario, depot) subproblem, in the order they are registered
+        self.spShift = []
+        self.spScenario = []
+        self.spDepot = []
+        self.spDepotPos = []
+        self.spModel = []
+
+        # master column that bounds the cost of each subproblem and the weight of the
+        # subproblem in it, several subproblems share a column when the cuts are aggregated
+        self.cutCols = []
+        self.cutWeights = []
+
+        # one entry per distinct subproblem model
+        self.modelDepotPos = []
+        self.fleetRows = []
+        self.ydCols = []
+
+    def addModel(self, shift, scenario, depot, sp):
+        # returns the position of the model in the registry, -1 marks the vehicle
+        # types without routes in this subproblem and every index of a model that
+        # is not a cplex model of this process (sp is None)
+        self.modelDepotPos.append(self.depotPos[depot.id])
+        rows = [-1] * self.numVehicleTypes
+        cols = [-1] * self.numVehicleTypes
+        for v in range(self.numVehicleTypes if sp is not None else 0):
+            vt = self.pdata.vehicleTypes[v]
+            c = sp.getConstraint(sp.getName("fleetSize", shift, scenario.id, depot.id, vt.type))
+            yd = sp.getVariable(sp.getName("yd", shift, scenario.id, depot.id, vt.type))
+            if c is not None:
+                rows[v] = c.row
+            if yd is not None:
+                cols[v] = yd.col
+        self.fleetRows.append(rows)
+        self.ydCols.append(cols)
+
+        return len(self.fleetRows) - 1
+
+    def addSubproblem(self, shift, scenario, depot, model):
+        # returns the position of the subproblem in the registry
+        self.spShift.append(shift)
+        self.spScenario.append(scenario)
+        self.spDepot.append(depot)
+        self.spDepotPos.append(self.depotPos[depot.id])
+        self.spModel.append(model)
+        if self.master is not None:
+            mode = self.pdata.params.cutAggregation
+            if mode == "shift":
+                name = self.master.getName("alphaH", shift, depot.id)
+            elif mode == "single":
+                name = "alphaT"
+            else:
+                name = self.master.getName("alpha", shift, scenario.id, depot.id)
+            self.cutCols.append(self.master.getVariable(name).col)
+            self.cutWeights.append(1.0 if mode == "multi" else 1/self.pdata.params.numberOfScenariosPerShift)
+
+        return len(self.spShift) - 1
+
+    def getNumSubproblems(self):
+        return len(self.spShift)
+
+    def getNumModels(self):
+        return len(self.fleetRows)
+
+    def toDepotDict(self, values):
+        # [depot][vehicle type] array to the {depot id: {vehicle type: value}} layout of the output
+        result = {}
+        for k in range(self.numDepots):
+            d = self.pdata.depotList[k]
+            result[d.id] = {}
+            for v in range(self.numVehicleTypes):
+                result[d.id][self.pdata.vehicleTypes[v].type] = values[k][v]
+        return result
@@ -1,3 +1,4 @@
+import bisect
 import cplex
 
 class Model:
@@ -15,6 +16,7 @@ class Model:
         self.constraints = {}
         self.numCols = 0
         self.numRows = 0
+        self.clearPending()
         self.lp = cplex.Cplex()
         if not self.doLog:
             self.lp.set_log_stream(None)
@@ -39,10 +41,75 @@ class Model:
         return s
 
     def createConstraint(self, mind, mval, sense, rhs, name):
+        # keep the rows in order if there are pending ones
+        self.flush()
+
         mConstraint = cplex.SparsePair(ind=mind, val=mval)
         self.lp.linear_constraints.add(lin_expr=[mConstraint],
                                     senses=[sense], rhs=[rhs],
                                     names=[name])
 
+    def deleteRows(self, rows):
+        # send the pending rows first so their indices are still right
+        self.flush()
+        self.lp.linear_constraints.delete(rows)
+        self.numRows -= len(rows)
+
+        # the registered rows after a deleted one move up
+        deleted = sorted(rows)
+        for name, c in self.constraints.iteritems():
+            c.row -= bisect.bisect_left(deleted, c.row)
+
+    def setMIPStarts(self, cols, starts):
+        # replace the mip starts by the (name, values of cols) in starts, cplex
+        # completes the other columns by solving the model with cols fixed
+        self.lp.MIP_starts.delete()
+        effort = self.lp.MIP_starts.effort_level.solve_fixed
+        for name, vals in starts:
+            self.lp.MIP_starts.add(cplex.SparsePair(ind=cols, val=vals), effort, name)
+
     def changeRHS(self, row, rhs):
-        self.lp.linear_constraints.set_rhs(row, rhs)
\ No newline at end of file
+        self.lp.linear_constraints.set_rhs(row, rhs)
+
+    def clearPending(self):
+        self.colNames = []
+        self.colObj = []
+        self.colTypes = []
+        self.rowNames = []
+        self.rowExprs = []
+        self.rowSenses = []
+        self.rowRhs = []
+
+    def addVariable(self, v, obj, type):
+        # the column gets its index now, but is sent to cplex by flush()
+        v.col = self.numCols
+        self.variables[v.name] = v
+        self.numCols += 1
+
+        self.colNames.append(v.name)
+        self.colObj.append(obj)
+        self.colTypes.append(type)
+
+    def addConstraint(self, c, mind, mval, sense, rhs):
+        # the row gets its index now, but is sent to cplex by flush(),
+        # rows without a name (the cuts) are only reachable by their index
+        c.row = self.numRows
+        if c.name != "":
+            self.constraints[c.name] = c
+        self.numRows += 1
+
+        self.rowNames.append(c.name)
+        self.rowExprs.append(cplex.SparsePair(ind=mind, val=mval))
+        self.rowSenses.append(sense)
+        self.rowRhs.append(rhs)
+
+    def flush(self):
+        # push the pending columns and rows with one call each
+        if len(self.colNames) > 0:
+            self.lp.variables.add(obj=self.colObj, types=self.colTypes, names=self.colNames)
+        if len(self.rowNames) > 0:
+            # cplex names unnamed rows itself when the lp is written
+            names = self.rowNames if "" not in self.rowNames else None
+            self.lp.linear_constraints.add(lin_expr=self.rowExprs, senses=self.rowSenses,
+                                           rhs=self.rowRhs, names=names)
+        self.clearPending()
@@ -0,0 +1,178 @@
+import numpy as np
+
+
+class RoutingDP:
+    # Exact dynamic program for the routing subproblem of one cluster, a drop-in
+    # replacement of its cplex model.
+    #
+    # The customers of the cluster are bits of a mask. Every route covers a set
+    # of customers and is done either by a leased vehicle of one of its types,
+    # which counts against the leased fleet of that type, or by the cheapest
+    # hired vehicle. The value of a mask of uncovered customers is computed by
+    # covering its lowest customer with each route that contains it, so every
+    # partition is generated once. Instead of a single cost, each mask keeps a
+    # table over the number of leased vehicles of each type that may be used,
+    # which gives the optimum for every leased fleet vector at once.
+    def __init__(self, pdata, cluster):
+        self.pdata = pdata
+        self.numVehicleTypes = len(pdata.vehicleTypes)
+        self.numCustomers = len(cluster.customers)
+        self.full = (1 << self.numCustomers) - 1
+        self.feasible = True
+
+        bit = {}
+        for k in range(self.numCustomers):
+            bit[cluster.customers[k].id] = 1 << k
+
+        # cheapest hired option and leased option of each type for every customer set
+        hired = {}
+        leased = {}
+        for v in range(self.numVehicleTypes):
+            vt = self.pdata.vehicleTypes[v]
+            if vt.type not in cluster.routes:
+                continue
+
+            for route in cluster.routes[vt.type]:
+                s = 0
+                for c in route.customers[1:-1]:
+                    s |= bit[c.id]
+                if s not in hired or vt.hvCost * route.distance < hired[s][0]:
+                    hired[s] = (vt.hvCost * route.distance, v)
+                leased[(s, v)] = vt.lvCost * route.distance
+
+        covered = 0
+        for s in hired:
+            covered |= s
+        if covered != self.full:
+            self.feasible = False
+
+        # a leased option is only kept if it is cheaper than hiring, otherwise it
+        # just wastes fleet, and a cluster never uses more leased vehicles of a
+        # type than it has customers
+        useful = {}
+        for (s, v), cost in leased.iteritems():
+            if cost < hired[s][0]:
+                useful[(s, v)] = cost
+        shape = []
+        for v in range(self.numVehicleTypes):
+            vt = self.pdata.vehicleTypes[v]
+            hasLeased = len([s for s, u in useful if u == v]) > 0
+            shape.append(min(vt.maxFleet, self.numCustomers) + 1 if hasLeased else 1)
+        self.shape = tuple(shape)
+
+        # routes grouped by the lowest customer they visit
+        self.routes = []
+        for k in range(self.numCustomers):
+            sets = sorted([s for s in hired if (s & -s) == 1 << k])
+            group = {}
+            group["sets"] = np.array(sets, dtype=np.int64)
+            group["hiredCost"] = np.array([hired[s][0] for s in sets])
+            group["hiredType"] = [hired[s][1] for s in sets]
+            group["leased"] = []
+            for v in range(self.numVehicleTypes):
+                pos = [j for j in range(len(sets)) if (sets[j], v) in useful]
+                if len(pos) > 0:
+                    group["leased"].append((v, np.array(pos, dtype=int),
+                                            np.array([useful[(sets[j], v)] for j in pos])))
+            self.routes.append(group)
+
+        # values[mask][c] is the cheapest cover of mask with at most c[v] leased vehicles of each type
+        self.values = {0: np.zeros(self.shape)}
+        if self.feasible:
+            self.computeValues(self.full)
+
+    def getCandidates(self, mask):
+        # routes of the lowest customer of mask that fit in it, and the masks left by each
+        group = self.routes[(mask & -mask).bit_length() - 1]
+        valid = np.flatnonzero(group["sets"] & mask == group["sets"])
+        rest = (mask ^ group["sets"][valid]).tolist()
+        return group, valid, rest
+
+    def getShift(self, v):
+        # source and target slices of a stack of tables that move them one leased vehicle of type v up
+        src = [slice(None)] * (self.numVehicleTypes + 1)
+        dst = [slice(None)] * (self.numVehicleTypes + 1)
+        src[v + 1] = slice(None, -1)
+        dst[v + 1] = slice(1, None)
+        return tuple(src), tuple(dst)
+
+    def computeValues(self, mask):
+        # the masks are evaluated with an explicit stack, a recursion would be as deep as the cluster
+        values = self.values
+        stack = [mask]
+        while len(stack) > 0:
+            m = stack[-1]
+            if m in values:
+                stack.pop()
+                continue
+
+            group, valid, rest = self.getCandidates(m)
+            missing = [r for r in rest if r not in values]
+            if len(missing) > 0:
+                stack.extend(missing)
+                continue
+
+            stack.pop()
+            tables = np.array([values[r] for r in rest])
+            axes = (len(valid),) + (1,) * self.numVehicleTypes
+
+            # hire a vehicle for the route
+            best = (tables + group["hiredCost"][valid].reshape(axes)).min(axis=0)
+
+            # or lease one, which leaves one vehicle of that type less for the rest of the cover
+            select = np.full(len(group["sets"]), -1, dtype=int)
+            select[valid] = np.arange(len(valid))
+            for v, pos, cost in group["leased"]:
+                rows = select[pos]
+                keep = rows >= 0
+                if not np.any(keep):
+                    continue
+                src, dst = self.getShift(v)
+                sub = tables[rows[keep]][src] + cost[keep].reshape((int(keep.sum()),) + axes[1:])
+                withLeased = np.full((1,) + self.shape, np.inf)
+                withLeased[dst] = sub.min(axis=0)
+                best = np.minimum(best, withLeased[0])
+
+            values[m] = best
+
+    def solve(self, fleet):
+        # (status, objective, hired vehicles per type) with the given leased fleet sizes,
+        # using cplex's status codes for an optimal and an infeasible subproblem
+        hired = np.zeros(self.numVehicleTypes)
+        if not self.feasible:
+            return (103, 0, hired)
+
+        # cplex solves the model of an empty cluster as an lp
+        if self.numCustomers == 0:
+            return (1, 0, hired)
+
+        c = tuple([min(int(round(fleet[v])), self.shape[v] - 1) for v in range(self.numVehicleTypes)])
+        obj = self.values[self.full][c]
+
+        # follow an optimal cover back to count the hired vehicles of each type
+        mask = self.full
+        while mask != 0:
+            target = self.values[mask][c]
+            group, valid, rest = self.getCandidates(mask)
+            step = None
+            for j in range(len(valid)):
+                if group["hiredCost"][valid[j]] + self.values[rest[j]][c] == target:
+                    hired[group["hiredType"][valid[j]]] += 1
+                    step = (rest[j], c)
+                    break
+
+            for v, pos, cost in (group["leased"] if step is None else []):
+                if c[v] == 0:
+                    continue
+                prev = c[:v] + (c[v] - 1,) + c[v + 1:]
+                for p in range(len(pos)):
+                    j = np.flatnonzero(valid == pos[p])
+                    if len(j) > 0 and cost[p] + self.values[rest[j[0]]][prev] == target:
+                        step = (rest[j[0]], prev)
+                        break
+                if step is not None:
+                    break
+
+            mask, c = step
+
+        return (101, float(obj), hired)
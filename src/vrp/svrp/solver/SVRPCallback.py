@@ -1,53 +1,132 @@
 from __future__ import division
 
 import time
+import threading
+import itertools
 import cplex
+import numpy as np
+from collections import OrderedDict
 from cplex.callbacks import UserCutCallback, LazyConstraintCallback
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
-from src.vrp.svrp.inputdata.ProblemData import ProblemData
 from src.vrp.svrp.solver.Variable import Variable
 from src.vrp.svrp.solver.Constraint import Constraint
 from src.vrp.svrp.solver.Model import Model
+from src.vrp.svrp.solver.IndexRegistry import IndexRegistry
+from src.vrp.svrp.solver.SubproblemPool import SubproblemPool
+from src.vrp.svrp.solver.RoutingDP import RoutingDP
 
 
 class SPSolver:
-    def __init__(self):
-        self.pdata = ProblemData()
+    def __init__(self, pdata, master, shard=None):
+        # shard is the (worker, number of workers) pair of a subproblem worker process,
+        # that only builds and solves its own share of the models
+        self.pdata = pdata
+        self.params = pdata.params
         self.zsup = 0
         self.infeasible = False
         self.hfleet = {}
+        self.results = []
+        self.selectedCols = []
+        self.buildTime = 0
+        self.cache = OrderedDict()
 
-        self.subproblems = {}
+        self.subproblems = []
         self.constraints = []
         self.senses = []
         self.rhs = []
 
-        self.master = self.pdata.master
+        self.master = master
+        self.shard = shard
+
+        # held by the callbacks for a whole sweep, cplex may run them from several threads
+        self.lock = threading.Lock()
+        self.pool = None
+        if shard is None and self.params.numSubproblemWorkers > 1:
+            self.pool = SubproblemPool(pdata, self.params.numSubproblemWorkers)
+
+        self.registry = IndexRegistry(pdata, master)
         self.createSubproblems()
 
+        # results of every distinct model for every leased fleet vector
+        self.valueTables = None
+        if shard is None and self.params.useValueTables:
+            self.buildValueTables()
+
+        # lower bound of the cost of each subproblem, used by the strengthened cuts
+        self.lowerBounds = [0.0] * self.registry.getNumSubproblems()
+        if shard is None and self.params.optimalityCuts != "nogood":
+            self.computeLowerBounds()
+
+    def useDP(self, cluster):
+        # whether the subproblem of the cluster is solved by the dynamic program
+        return self.params.subproblemBackend == "dp" and len(cluster.customers) <= self.params.dpMaxCustomers
+
+    def ownsModel(self, m):
+        # whether the distinct model m is built and solved by this process
+        if self.pool is not None:
+            return False
+        if self.shard is None:
+            return True
+        return m % self.shard[1] == self.shard[0]
+
     def createSubproblems(self):
-        print "Creating subproblems..."
-        self.subproblems = {}
+        if self.shard is None:
+            print "Creating subproblems..."
+        startTime = time.time()
+        self.subproblems = []
+
+        # a subproblem only depends on its depot and on the customers allocated to it,
+        # so scenarios and shifts with the same cluster share a single model
+        models = {}
 
         # create a subproblem for each shift, depot, scenario
         for t in range(self.pdata.shifts):
-            self.subproblems[t] = {}
-            for i in range(params.numberOfScenariosPerShift):
-                self.subproblems[t][i] = {}
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.pdata.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     d = cluster.depot
-                    sp = self.subproblems[t][i][d.id] = Model()
-
-                    # set the objective of the subproblem
-                    sp.lp.objective.set_sense(sp.lp.objective.sense.minimize)
-                    self.createXYVariables(sp, t, scenario, cluster)
-                    self.createYDVariables(sp, t, scenario, cluster)
-                    self.fleetSizeConstraints(sp, t, scenario, cluster, 0)
-                    self.customerSatisfactionConstraints(sp, t, scenario, cluster)
-                    self.createYCouplingConstraints(sp, t, scenario, cluster)
-                    # sp.lp.write("lps\\svrpCB_subproblem_" + str(t) + "_" + str(i) + "_" + str(d.id) + ".lp")
+                    key = (d.id, tuple(sorted([c.id for c in cluster.customers])))
+
+                    if key not in models and not self.ownsModel(len(models)):
+                        models[key] = self.registry.addModel(t, scenario, d, None)
+                        self.subproblems.append(None)
+
+                    elif key not in models and self.useDP(cluster):
+                        models[key] = self.registry.addModel(t, scenario, d, None)
+                        self.subproblems.append(RoutingDP(self.pdata, cluster))
+
+                    elif key not in models:
+                        sp = Model()
+
+                        # set the objective of the subproblem
+                        sp.lp.objective.set_sense(sp.lp.objective.sense.minimize)
+                        self.createXYVariables(sp, t, scenario, cluster)
+                        self.createYDVariables(sp, t, scenario, cluster)
+                        self.fleetSizeConstraints(sp, t, scenario, cluster, 0)
+                        self.customerSatisfactionConstraints(sp, t, scenario, cluster)
+                        self.createYCouplingConstraints(sp, t, scenario, cluster)
+
+                        # send all the columns and rows to cplex at once
+                        sp.flush()
+                        models[key] = self.registry.addModel(t, scenario, d, sp)
+                        self.subproblems.append(sp)
+                        # sp.lp.write("lps\\svrpCB_subproblem_" + str(t) + "_" + str(i) + "_" + str(d.id) + ".lp")
+
+                    self.registry.addSubproblem(t, scenario, d, models[key])
+
+        self.buildTime = time.time() - startTime
+        if self.shard is not None:
+            return
+
+        numSubproblems = self.registry.getNumSubproblems()
+        numModels = self.registry.getNumModels()
+        numDP = len([sp for sp in self.subproblems if isinstance(sp, RoutingDP)])
+        if numDP > 0:
+            print "%d distinct subproblems solved by dynamic programming" % numDP
+        self.pdata.problemSolution.subproblems = numSubproblems
+        self.pdata.problemSolution.distinctSubproblems = numModels
+        print "Subproblems created in %.2f (s): %d distinct out of %d (dedup ratio %.2f)" % \
+              (self.buildTime, numModels, numSubproblems, numSubproblems / max(numModels, 1))
 
     def createXYVariables(self, model, shift, scenario, cluster):
         for vt in self.pdata.vehicleTypes:
@@ -59,33 +138,23 @@ class SPSolver:
                 v = Variable()
                 v.type = Variable.v_x
                 v.name = model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                v.col = model.numCols
                 v.shift = shift
                 v.scenario = scenario
                 v.depot = cluster.depot
                 v.route = route
                 v.vehicleType = vt
-
-                coef = vt.lvCost * route.distance
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
-                model.numCols += 1
+                model.addVariable(v, vt.lvCost * route.distance, "B")
 
                 # Create y variable
                 v = Variable()
                 v.type = Variable.v_y
                 v.name = model.getName("y", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                v.col = model.numCols
                 v.shift = shift
                 v.scenario = scenario
                 v.depot = cluster.depot
                 v.route = route
                 v.vehicleType = vt
-
-                coef = vt.hvCost * route.distance
-                model.variables[v.name] = v
-                model.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
-                model.numCols += 1
+                model.addVariable(v, vt.hvCost * route.distance, "B")
 
     def createYDVariables(self, model, shift, scenario, cluster):
         for vt in self.pdata.vehicleTypes:
@@ -96,16 +165,11 @@ class SPSolver:
             v = Variable()
             v.type = Variable.v_yd
             v.name = model.getName("yd", shift, scenario.id, cluster.depot.id, vt.type)
-            v.col = model.numCols
             v.shift = shift
             v.scenario = scenario
             v.depot = cluster.depot
             v.vehicleType = vt
-
-            coef = 0
-            model.variables[v.name] = v
-            model.lp.variables.add(obj=[coef], types=["I"], names=[v.name])
-            model.numCols += 1
+            model.addVariable(v, 0, "I")
 
     def createYCouplingConstraints(self, model, shift, scenario, cluster):
         for vt in self.pdata.vehicleTypes:
@@ -119,7 +183,6 @@ class SPSolver:
             c.scenario = scenario
             c.depot = cluster.depot.id
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -137,9 +200,7 @@ class SPSolver:
                 mind.append(yvar.col)
                 mval.append(1.0)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "E", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "E", rhs)
 
     def fleetSizeConstraints(self, model, shift, scenario, cluster, nval):
         for vt in self.pdata.vehicleTypes:
@@ -152,7 +213,6 @@ class SPSolver:
             c.scenario = scenario
             c.depot = cluster.depot.id
             c.vehicleType = vt
-            c.row = model.numRows
 
             mind = []
             mval = []
@@ -165,242 +225,485 @@ class SPSolver:
                 mind.append(xvar.col)
                 mval.append(1.0)
 
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "L", rhs, c.name)
-            model.numRows += 1
+            model.addConstraint(c, mind, mval, "L", rhs)
 
     def customerSatisfactionConstraints(self, model, shift, scenario, cluster):
+        # collect the x and y columns of every customer in a single pass over the routes
+        mind = {}
+        mval = {}
+        for customer in cluster.customers:
+            mind[customer.id] = []
+            mval[customer.id] = []
+
+        for vt in self.pdata.vehicleTypes:
+            if vt.type not in cluster.routes:
+                continue
+
+            for route in cluster.routes[vt.type]:
+                xvar = model.getVariable(model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type))
+                yvar = model.getVariable(model.getName("y", shift, scenario.id, cluster.depot.id, route.id, vt.type))
+
+                # the first and last stops of a route are the depot
+                for customer in route.customers[1:-1]:
+                    mind[customer.id].extend([xvar.col, yvar.col])
+                    mval[customer.id].extend([1.0, 1.0])
+
         for customer in cluster.customers:
             c = Constraint()
             c.type = Constraint.c_demand
             c.name = model.getName("demand", shift, scenario.id, cluster.depot.id)
-            c.row = model.numRows
+            model.addConstraint(c, mind[customer.id], mval[customer.id], "E", 1.0)
+
+    def getFleetValues(self, master_sol):
+        # leased fleet size of each [depot][vehicle type] in a master solution,
+        # the "n" columns of each depot that are part of it are kept for the cuts
+        reg = self.registry
+        sol = np.asarray(master_sol)
+        nvals = np.zeros((reg.numDepots, reg.numVehicleTypes))
+        zfleet = 0
+        self.selectedCols = []
+        self.dominatedCols = []
+
+        for k in range(reg.numDepots):
+            selected = []
+            dominated = []
+            for v in range(reg.numVehicleTypes):
+                cols = reg.nCols[k][v]
+                vals = sol[cols]
+                nvals[k, v] = np.dot(reg.nDigits[v], vals)
+                zfleet += nvals[k, v] * reg.nCosts[k][v]
+                selected.extend(cols[vals != 0].tolist())
+
+                # the digits of this vehicle type that are not above the current fleet
+                dominated.extend(cols[:int(round(nvals[k, v])) + 1].tolist())
+            self.selectedCols.append(selected)
+            self.dominatedCols.append(dominated)
+
+        return nvals, float(zfleet)
+
+    def evaluate(self, nvals):
+        # solve every distinct subproblem once with the given leased fleet sizes and
+        # keep (status, objective, hired fleet) for each subproblem in registry order
+        reg = self.registry
+        if self.pool is not None and self.valueTables is None:
+            modelResults = self.pool.evaluate(nvals, reg.getNumModels())
+        else:
+            modelResults = [None] * reg.getNumModels()
+        self.results = []
+        hfleet = np.zeros((reg.numDepots, reg.numVehicleTypes))
+
+        for k in range(reg.getNumSubproblems()):
+            m = reg.spModel[k]
+            d = reg.spDepotPos[k]
+
+            if modelResults[m] is None:
+                modelResults[m] = self.getModelResult(m, nvals[d])
+
+            status, sp_obj, hired = modelResults[m]
+            hfleet[d] = np.maximum(hfleet[d], hired)
+            self.results.append(modelResults[m])
+
+        self.hfleet = reg.toDepotDict(hfleet)
+
+    def evaluateShard(self, nvals):
+        # (model, result) pairs of the models owned by a subproblem worker
+        reg = self.registry
+        return [(m, self.getModelResult(m, nvals[reg.modelDepotPos[m]]))
+                for m in range(reg.getNumModels()) if self.subproblems[m] is not None]
+
+    def close(self):
+        # stop the subproblem workers
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def getFleetIndex(self, fleet):
+        # position of a leased fleet vector in the value tables
+        index = 0
+        for v in range(self.registry.numVehicleTypes):
+            index = index * (self.pdata.vehicleTypes[v].maxFleet + 1) + int(round(fleet[v]))
+        return index
+
+    def buildValueTables(self):
+        startTime = time.time()
+        numModels = self.registry.getNumModels()
+
+        if self.pool is not None:
+            tables = self.pool.getValueTables()
+        else:
+            tables = self.getShardValueTables()
+
+        self.valueTables = [None] * numModels
+        solves = 0
+        for m, table, tableSolves in tables:
+            self.valueTables[m] = table
+            solves += tableSolves
+
+        numVectors = len(self.valueTables[0]) if numModels > 0 else 0
+        solution = self.pdata.problemSolution
+        solution.tableTime = time.time() - startTime
+        solution.tableEntries = numModels * numVectors
+        print "Value tables built in %.2f (s): %d models x %d fleet vectors, %d solves for %d entries" % \
+              (solution.tableTime, numModels, numVectors, solves, solution.tableEntries)
+
+    def getShardValueTables(self):
+        # (model, table, number of solves) for every model of this process
+        return [(m,) + self.getValueTable(m) for m in range(self.registry.getNumModels())
+                if self.subproblems[m] is not None]
+
+    def getValueTable(self, m):
+        # results of model m for every leased fleet vector. The cost is non-increasing in the
+        # fleet, so the solution found for a fleet n that leases u vehicles is also optimal
+        # for every fleet between u and n. The vectors are visited from the largest one
+        # down and each solve fills that whole box of the table.
+        sizes = [vt.maxFleet + 1 for vt in self.pdata.vehicleTypes]
+        table = [None] * int(np.prod(sizes))
+        solves = 0
+
+        for fleet in itertools.product(*[range(size - 1, -1, -1) for size in sizes]):
+            if table[self.getFleetIndex(fleet)] is not None:
+                continue
 
-            mind = []
-            mval = []
-            rhs = 1.0
-
-            for vt in self.pdata.vehicleTypes:
-                if vt.type not in cluster.routes:
-                    continue
-
-                for route in cluster.routes[vt.type]:
-                    # check if customer c belongs in this route
-                    if customer in route.customers:
-                        # add the x variable
-                        xname = model.getName("x", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                        xvar = model.getVariable(xname)
-                        mind.append(xvar.col)
-                        mval.append(1.0)
-
-                        # add the y variable
-                        yname = model.getName("y", shift, scenario.id, cluster.depot.id, route.id, vt.type)
-                        yvar = model.getVariable(yname)
-                        mind.append(yvar.col)
-                        mval.append(1.0)
-
-            model.constraints[c.name] = c
-            model.createConstraint(mind, mval, "E", rhs, c.name)
-            model.numRows += 1
+            result = self.solveModel(m, fleet)
+            used = self.getLeasedVehicles(m, result, fleet)
+            solves += 1
+
+            for box in itertools.product(*[range(used[v], fleet[v] + 1) for v in range(len(sizes))]):
+                table[self.getFleetIndex(box)] = result
+
+        return table, solves
+
+    def getLeasedVehicles(self, m, result, fleet):
+        # leased vehicles of each type used by the last solution of model m
+        sp = self.subproblems[m]
+        status, sp_obj, hired = result
+
+        if isinstance(sp, RoutingDP):
+            # the dynamic program is a table lookup, every vector is solved on its own
+            return list(fleet)
+        if status not in [1,101,102]:
+            # an infeasible subproblem is also infeasible with a smaller fleet
+            return [0] * len(fleet)
+
+        rows = self.registry.fleetRows[m]
+        used = [0] * len(fleet)
+        for v in range(len(fleet)):
+            if rows[v] >= 0:
+                used[v] = int(round(sp.lp.solution.get_activity_levels(rows[v])))
+        return used
+
+    def getModelResult(self, m, fleet):
+        if self.valueTables is not None:
+            return self.valueTables[m][self.getFleetIndex(fleet)]
+
+        # the result of a model only depends on the leased fleet of its depot
+        size = self.params.subproblemCacheSize
+        if size <= 0:
+            return self.solveModel(m, fleet)
+
+        solution = self.pdata.problemSolution
+        key = (m, tuple(fleet))
+        result = self.cache.pop(key, None)
+
+        if result is not None:
+            solution.cacheHits += 1
+        else:
+            solution.cacheMisses += 1
+            result = self.solveModel(m, fleet)
+            if len(self.cache) >= size:
+                self.cache.popitem(last=False)
+
+        # (re)insert as the most recently used entry
+        self.cache[key] = result
+        return result
+
+    def solveModel(self, m, fleet):
+        # solve the distinct subproblem m with the leased fleet size of each vehicle type
+        reg = self.registry
+        sp = self.subproblems[m]
+        rows = reg.fleetRows[m]
+
+        if isinstance(sp, RoutingDP):
+            startTime = time.time()
+            result = sp.solve(fleet)
+            self.pdata.problemSolution.subproblemTime += time.time() - startTime
+            return result
+
+        # change the rhs of the fleet size constraints with the values obtained from the master,
+        # there might be no demands for a vehicle type of a depot in a given scenario
+        rhs = [(rows[v], fleet[v]) for v in range(reg.numVehicleTypes) if rows[v] >= 0]
+        if len(rhs) > 0:
+            sp.lp.linear_constraints.set_rhs(rhs)
+
+        # solve the subproblem
+        startTime = time.time()
+        sp.lp.solve()
+        self.pdata.problemSolution.subproblemTime += time.time() - startTime
+
+        # get the subproblem status
+        sp_sol = sp.lp.solution
+        status = sp_sol.get_status()
+        sp_obj = 0
+        hired = np.zeros(reg.numVehicleTypes)
+
+        if status in [101,102]: # feasible optimum
+            sol = sp_sol.get_values()
+            sp_obj = sp_sol.get_objective_value()
+
+            # get the hired vehicles fleet size, for each vehicle type, for this subproblem
+            cols = reg.ydCols[m]
+            for v in range(reg.numVehicleTypes):
+                if cols[v] >= 0:
+                    hired[v] = sol[cols[v]]
+
+        return (status, sp_obj, hired)
+
+    def computeLowerBounds(self):
+        # the cost of a subproblem is non-increasing in the leased fleet, so its cost
+        # with the largest fleet of every vehicle type bounds it from below
+        reg = self.registry
+        fleet = np.array([[vt.maxFleet for vt in self.pdata.vehicleTypes]] * reg.numDepots, dtype=float)
+        self.evaluate(fleet)
+
+        for k in range(len(self.results)):
+            status, sp_obj, hired = self.results[k]
+            if status in [101,102]:
+                self.lowerBounds[k] = sp_obj
+
+        # alpha >= L holds everywhere, so it is set as the bound of the alpha columns,
+        # an aggregated column gets the weighted sum of the bounds of its subproblems
+        bounds = OrderedDict()
+        for k in range(len(self.lowerBounds)):
+            col = reg.cutCols[k]
+            bounds[col] = bounds.get(col, 0.0) + reg.cutWeights[k] * self.lowerBounds[k]
+        self.master.lp.variables.set_lower_bounds(bounds.items())
+        print "Subproblem lower bounds: %.2f in total" % sum(self.lowerBounds)
+
+    def getOptimalityCut(self, k, sp_obj):
+        # (mind, mval, rhs) of a ">=" cut on the alpha of subproblem k, scaled by its
+        # weight in the column when the cuts are aggregated
+        d = self.registry.spDepotPos[k]
+        alpha = self.registry.cutCols[k]
+        w = self.registry.cutWeights[k]
+        mode = self.params.optimalityCuts
+
+        if mode == "nogood":
+            # alpha >= sp_obj when the current fleet digits of the depot are selected
+            selected = self.selectedCols[d]
+            mind = [alpha] + selected
+            mval = [1.0] + [-w * sp_obj] * len(selected)
+            return mind, mval, -w * sp_obj * (len(selected) - 1)
+
+        # integer L-shaped cut: alpha >= (sp_obj - L) * delta + L, where delta is 1 on the
+        # selected fleet vectors and at most 0 elsewhere, and L is a lower bound of the cost
+        low = self.lowerBounds[k]
+        if mode == "lshaped":
+            # delta is 1 only on the current fleet
+            cols = self.selectedCols[d]
+            terms = len(cols)
+        else:
+            # monotone: the cost of a fleet that is nowhere larger than the current one is at
+            # least sp_obj, so delta is 1 for every fleet with all digits at most the current ones
+            cols = self.dominatedCols[d]
+            terms = self.registry.numVehicleTypes
+
+        mind = [alpha] + cols
+        mval = [1.0] + [-w * (sp_obj - low)] * len(cols)
+        return mind, mval, w * (-(sp_obj - low) * (terms - 1) + low)
+
+    def mergeCuts(self, cuts):
+        # sums the (k, mind, mval, rhs) optimality cuts that bound the same master column,
+        # every cut has that column first with coefficient 1, which the sum keeps
+        if self.params.cutAggregation == "multi":
+            return cuts
+
+        merged = OrderedDict()
+        for k, mind, mval, rhs in cuts:
+            if mind[0] not in merged:
+                merged[mind[0]] = (k, OrderedDict(), [0.0])
+            first, terms, total = merged[mind[0]]
+            for j in range(1, len(mind)):
+                terms[mind[j]] = terms.get(mind[j], 0.0) + mval[j]
+            total[0] += rhs
+
+        result = []
+        for col, (k, terms, total) in merged.iteritems():
+            result.append((k, [col] + terms.keys(), [1.0] + terms.values(), total[0]))
+        return result
+
+    def getFeasibilityCut(self, k):
+        # (mind, mval, rhs) of a "<=" cut that forbids the current fleet digits of the depot of
+        # subproblem k, in monotone mode also every fleet that is nowhere larger
+        d = self.registry.spDepotPos[k]
+        if self.params.optimalityCuts == "monotone":
+            cols = self.dominatedCols[d]
+            return list(cols), [1.0] * len(cols), self.registry.numVehicleTypes - 1
+
+        selected = self.selectedCols[d]
+        return list(selected), [1.0] * len(selected), len(selected) - 1
 
     def solve(self, master_sol):
-        self.zsup = 0
         self.infeasible = False
-        self.hfleet = {}
-        nvals = {}
-
-        for key, d in self.pdata.depots.iteritems():
-            nvals[d.id] = {}
-            self.hfleet[d.id] = {}
-            for vt in self.pdata.vehicleTypes:
-                nvals[d.id][vt.type] = 0
-                self.hfleet[d.id][vt.type] = 0
-
-                for i in range(vt.maxFleet + 1):
-                    nvar = self.master.getVariable(self.master.getName("n", d.id, i, vt.type))
-                    nvar.solutionVal = master_sol[nvar.col]
-                    self.zsup += (nvar.digit * nvar.solutionVal) * self.pdata.depotCosts[d.id][vt.type]
-
-                    nvals[d.id][vt.type] += (nvar.digit * nvar.solutionVal)
+        nvals, self.zsup = self.getFleetValues(master_sol)
+        self.evaluate(nvals)
 
         self.constraints = []
         self.senses = []
         self.rhs = []
-        oCont = 0
 
-        # Run each subproblem with the updated n values of the trial solution
-        # and add the proper feasibility and optimality cuts
-        for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
-                scenario = self.pdata.scenarios[t][i]
-                for cluster in scenario.clusterList:
-                    depot = cluster.depot
-
-                    # Get the subproblem
-                    sp = self.subproblems[t][i][depot.id]
-
-                    for vt in self.pdata.vehicleTypes:
-                        # change the rhs of the fleet size constraint with the value obtained from the master
-                        nval = nvals[depot.id][vt.type]
-                        c = sp.getConstraint(sp.getName("fleetSize", t, i, depot.id, vt.type))
-                        if c is not None: # there might be no demands for a depot in a given cenario.
-                            sp.changeRHS(c.row, nval)
-
-                    # solve the subproblem
-                    sp.lp.solve()
-
-                    # get the subproblem status
-                    sp_sol = sp.lp.solution
-                    status = sp_sol.get_status()
-
-                    if status in [101,102]: # feasible optimum
-                        sol = sp_sol.get_values()
-
-                        # add the objective value
-                        sp_obj = sp_sol.get_objective_value()
-                        self.zsup += (1/params.numberOfScenariosPerShift) * sp_obj
-
-                        # get the hired vehicles fleet size, for each vehicle type, for this subproblem
-                        for vt in self.pdata.vehicleTypes:
-                            ydvar = sp.getVariable(sp.getName("yd", t, i, depot.id, vt.type))
-                            if ydvar is not None:
-                                fsize = sol[ydvar.col]
-                                currentSize = self.hfleet[depot.id][vt.type]
-                                self.hfleet[depot.id][vt.type] = max(fsize, currentSize)
-
-                        # create optimality cut in the master problem
-                        mind = []
-                        mval = []
-                        contVars = 0
-
-                        # get the alpha variable
-                        alpha = self.master.getVariable(self.master.getName("alpha", t, scenario.id, depot.id))
-                        mind.append(alpha.col)
-                        mval.append(1.0)
-
-                        #get the "N" variables
-                        for vt in self.pdata.vehicleTypes:
-                            for k in range(vt.maxFleet + 1):
-                                nvar = self.master.getVariable(self.master.getName("n", depot.id, k, vt.type))
-
-                                # check if the variable is part of the current master solution
-                                if nvar.solutionVal != 0:
-                                    contVars += 1
-                                    mind.append(nvar.col)
-                                    mval.append(-sp_obj)
-
-                        contVars -= 1
-
-                        # create constraint an add it to the list
-                        oCont += 1
-                        self.constraints.append(cplex.SparsePair(ind=mind, val=mval))
-                        self.senses.append("G")
-                        self.rhs.append(-sp_obj*contVars)
-
-                    elif status in [103]: # infeasible
-                        print "INFEASIBLE SUBPROBLEM-------------------------------------"
-                        self.infeasible = True
-
-                        # create an infeasiblity cut in the master problem
-                        #self.createFeasibilityCut(depot)
-                    else:
-                        pass
+        # add the proper feasibility and optimality cuts for each subproblem
+        cuts = []
+        for k in range(len(self.results)):
+            status, sp_obj, hired = self.results[k]
+
+            if status in [101,102]: # feasible optimum
+                # add the objective value
+                self.zsup += (1/self.params.numberOfScenariosPerShift) * sp_obj
+
+                # create optimality cut in the master problem
+                cuts.append((k,) + self.getOptimalityCut(k, sp_obj))
+
+            elif status in [103]: # infeasible
+                print "INFEASIBLE SUBPROBLEM-------------------------------------"
+                self.infeasible = True
+
+                # create an infeasiblity cut in the master problem
+                #self.createFeasibilityCut(depot)
+            else:
+                pass
+
+        # and add them to the list, summed per master column when they are aggregated
+        for k, mind, mval, rhs in self.mergeCuts(cuts):
+            self.constraints.append(cplex.SparsePair(ind=mind, val=mval))
+            self.senses.append("G")
+            self.rhs.append(rhs)
 
 
 class SVRPLazyCallback(LazyConstraintCallback):
     def __init__(self, env):
         LazyConstraintCallback.__init__(self, env)
 
-        self.pdata = ProblemData()
-        self.master = self.pdata.master
+        self.pdata = None
+        self.params = None
         self.spSolver = None
+        self.fname = ""
         self.iter = 0
         self.initTime = time.time()
         self.f_cons = 0
         self.o_cons = 0
+
+        # protects the counters and the log files when cplex runs several threads
+        self.lock = threading.Lock()
+
+    def initialize(self, pdata, spSolver):
+        # cplex creates the callback object, so the instance data is attached afterwards
+        self.pdata = pdata
+        self.params = pdata.params
+        self.spSolver = spSolver
         self.initlog()
 
     def initlog(self):
+        # runs with other cuts get their own logs so they can be compared
+        cuts = "" if self.params.optimalityCuts == "nogood" else "_" + self.params.optimalityCuts
+        if self.params.cutAggregation != "multi":
+            cuts += "_" + self.params.cutAggregation
+        self.fname = "output/" + self.pdata.instanceName + cuts + ".log"
+
         # create log files
-        f = open("output/" + self.pdata.instanceName + ".log.csv", "w")
+        f = open(self.fname + ".csv", "w")
         header = "Callbacks; Zinf; Zsup; Incumbent; O_Cuts; F_Cuts; Time (s)\n"
         f.write(header)
         f.close()
 
-        f = open("output/" + self.pdata.instanceName + ".log", "w")
+        f = open(self.fname, "w")
         f.close()
 
     def __call__(self):
-        self.iter += 1
-        self.pdata.problemSolution.callbacks += 1
-
         # get the current solution
         master_sol = self.get_values()
         zinf = self.get_objective_value()
 
+        # the subproblems (and their workers) are shared by all the cplex threads,
+        # so each sweep takes the solver and copies out what the cuts need
         spSolver = self.spSolver
-        spSolver.solve(master_sol)
+        with spSolver.lock:
+            spSolver.solve(master_sol)
+            zsup = spSolver.zsup
+            violated = spSolver.infeasible or zsup - zinf > self.params.eps
+            cuts = zip(spSolver.constraints, spSolver.senses, spSolver.rhs) if violated else []
+
+            # the solution counters are shared with the other callbacks
+            self.pdata.problemSolution.callbacks += 1
+            self.pdata.problemSolution.o_cuts += len(cuts)
+            if not violated:
+                # accept the incumbent, save the hired vehicles fleet solution
+                self.pdata.problemSolution.hiredFleet = spSolver.hfleet
 
         # Add all the cuts to the problem
-        if(spSolver.infeasible or spSolver.zsup - zinf > params.eps):
-            for i in range(len(spSolver.constraints)):
-                self.o_cons += 1
-                self.pdata.problemSolution.o_cuts += 1
-                self.add(constraint = spSolver.constraints[i], sense = spSolver.senses[i], rhs = spSolver.rhs[i], use=True)
-        else:
-            # accept the incumbent, save the hired vehicles fleet solution
-            self.pdata.problemSolution.hiredFleet = spSolver.hfleet
-
+        for constraint, sense, rhs in cuts:
+            self.add(constraint = constraint, sense = sense, rhs = rhs, use=True)
 
         incumbent = self.get_incumbent_objective_value()
-        currentTime = time.time()
-        elapsed = currentTime - self.initTime
 
-        s_iter = str(self.iter)
-        s_zinf = "{:.2f}".format(zinf).replace(".",",")
-        s_zsup = "{:.2f}".format(spSolver.zsup).replace(".",",")
-        s_incumbent = "{:.2f}".format(incumbent).replace(".",",")
-        s_ocons = str(self.o_cons)
-        s_fcons = str(self.f_cons)
-        s_elapsed = "{:.2f}".format(elapsed).replace(".",",")
+        with self.lock:
+            self.iter += 1
+            self.o_cons += len(cuts)
+            currentTime = time.time()
+            elapsed = currentTime - self.initTime
 
-        line = s_iter + ";" + s_zinf + ";" + \
-               s_zsup + ";" + s_incumbent + \
-               ";" + s_ocons + ";" + s_fcons + ";" + s_elapsed
+            s_iter = str(self.iter)
+            s_zinf = "{:.2f}".format(zinf).replace(".",",")
+            s_zsup = "{:.2f}".format(zsup).replace(".",",")
+            s_incumbent = "{:.2f}".format(incumbent).replace(".",",")
+            s_ocons = str(self.o_cons)
+            s_fcons = str(self.f_cons)
+            s_elapsed = "{:.2f}".format(elapsed).replace(".",",")
 
+            line = s_iter + ";" + s_zinf + ";" + \
+                   s_zsup + ";" + s_incumbent + \
+                   ";" + s_ocons + ";" + s_fcons + ";" + s_elapsed
 
-        s_formatted = "Iter: %s | Zinf: %s | Zsup: %s | Incumbent: %s | O_Cuts: %s | FCuts: %s | Time: %s (s)" \
-              % (s_iter, s_zinf, s_zsup, s_incumbent, s_ocons, s_fcons, s_elapsed)
 
-        # print to screen
-        print s_formatted
+            s_formatted = "Iter: %s | Zinf: %s | Zsup: %s | Incumbent: %s | O_Cuts: %s | FCuts: %s | Time: %s (s)" \
+                  % (s_iter, s_zinf, s_zsup, s_incumbent, s_ocons, s_fcons, s_elapsed)
 
-        # Update log files
-        f = open("output/" + self.pdata.instanceName + ".log", "a")
-        f.write(s_formatted + "\n")
-        f.close()
+            # print to screen
+            print s_formatted
 
-        f = open("output/" + self.pdata.instanceName + ".log.csv", "a")
-        f.write(line + "\n")
-        f.close()
+            # Update log files
+            f = open(self.fname, "a")
+            f.write(s_formatted + "\n")
+            f.close()
+
+            f = open(self.fname + ".csv", "a")
+            f.write(line + "\n")
+            f.close()
 
 class SVRPUserCallback(UserCutCallback):
     def __init__(self, env):
         UserCutCallback.__init__(self, env)
 
-        self.pdata = ProblemData()
+        self.pdata = None
+        self.params = None
         self.spSolver = None
 
+    def initialize(self, pdata, spSolver):
+        self.pdata = pdata
+        self.params = pdata.params
+        self.spSolver = spSolver
+
     def __call__(self):
         # get the current solution
         master_sol = self.get_values()
         zinf = self.get_objective_value()
 
         spSolver = self.spSolver
-        spSolver.solve(master_sol)
+        with spSolver.lock:
+            spSolver.solve(master_sol)
+            violated = spSolver.infeasible or spSolver.zsup - zinf > self.params.eps
+            cuts = zip(spSolver.constraints, spSolver.senses, spSolver.rhs) if violated else []
+            self.pdata.problemSolution.o_cuts += len(cuts)
 
         # Add all the cuts to the problem
-        if(spSolver.infeasible or spSolver.zsup - zinf > params.eps):
-            for i in range(len(spSolver.constraints)):
-                self.pdata.problemSolution.o_cuts += 1
-                self.add(cut = spSolver.constraints[i], sense = spSolver.senses[i], rhs = spSolver.rhs[i], use=True)
\ No newline at end of file
+        for constraint, sense, rhs in cuts:
+            self.add(cut = constraint, sense = sense, rhs = rhs, use=True)
@@ -2,9 +2,7 @@ from __future__ import division
 
 import cplex
 import numpy as np
-import matplotlib.pyplot as plt
 
-from src.vrp.svrp.inputdata.Parameters import Parameters as params
 from src.vrp.svrp.inputdata.ProblemData import ProblemData
 from src.vrp.svrp.inputdata.Scenario import Scenario
 from src.vrp.svrp.solver.Variable import Variable
@@ -14,6 +12,7 @@ class Solver:
         assert isinstance(pdata, ProblemData)
 
         self.pdata = pdata
+        self.params = pdata.params
         self.scenarios = {}
 
         self.lp = None
@@ -63,7 +62,7 @@ class Solver:
     def createXYVariables(self):
         numVars = 0
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     for route in cluster.routes:
@@ -78,7 +77,7 @@ class Solver:
                         v.depot = cluster.depot
                         v.route = route
 
-                        coef = float((1 / params.numberOfScenariosPerShift)) * self.pdata.lvCost * route.distance
+                        coef = float((1 / self.params.numberOfScenariosPerShift)) * self.pdata.lvCost * route.distance
                         self.variables[v.name] = v
                         self.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
                         self.numCols += 1
@@ -95,7 +94,7 @@ class Solver:
                         v.depot = cluster.depot
                         v.route = route
 
-                        coef = (1 / params.numberOfScenariosPerShift) * self.pdata.hvCost * route.distance
+                        coef = (1 / self.params.numberOfScenariosPerShift) * self.pdata.hvCost * route.distance
                         self.variables[v.name] = v
                         self.lp.variables.add(obj=[coef], types=["B"], names=[v.name])
                         self.numCols += 1
@@ -124,7 +123,7 @@ class Solver:
     def fleetPerDepotConstraints(self):
         numCons = 0
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     mind = []
@@ -151,7 +150,7 @@ class Solver:
     def customerSatisfactionConstraints(self):
         numCons = 0
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.scenarios[t][i]
                 for cluster in scenario.clusterList:
                     for c in cluster.customers:
@@ -190,7 +189,7 @@ class Solver:
         print "Creating scenarios..."
         for t in range(self.pdata.shifts):
             self.scenarios[t] = {}
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 self.scenarios[t][i] = Scenario(i,t,self.pdata)
 
     def solve(self):
@@ -220,7 +219,7 @@ class Solver:
 
         # get routes for each shift and scenario
         for t in range(self.pdata.shifts):
-            for i in range(params.numberOfScenariosPerShift):
+            for i in range(self.params.numberOfScenariosPerShift):
                 scenario = self.scenarios[t][i]
                 routes = []
                 for cluster in scenario.clusterList:
@@ -249,9 +248,12 @@ class Solver:
                 if len(routes) > 0:
                     self.plotShiftSolution(scenario, routes)
 
+        import matplotlib.pyplot as plt
         plt.show()
 
     def plotShiftSolution(self, scenario, routes):
+        import matplotlib.pyplot as plt
+
         # create new plot
         fig = plt.figure()
         fig.suptitle('Shift:' + str(scenario.shift) + " - Scenario:" + str(scenario.id) , fontsize=20)
@@ -0,0 +1,132 @@
+import time
+import select
+import multiprocessing
+from collections import deque
+
+
+class SubproblemPool:
+    # Long lived worker processes that own the subproblem models. Worker w
+    # builds and solves the distinct models m with m % numWorkers == w, so
+    # only the leased fleet sizes travel to the workers on each evaluation
+    # and the results do not depend on the number of workers.
+    def __init__(self, pdata, numWorkers):
+        self.pdata = pdata
+        self.numWorkers = numWorkers
+        self.workers = []
+        self.connections = []
+
+        # tags of the asynchronous requests each worker has not answered yet, in order
+        self.pending = [deque() for w in range(numWorkers)]
+
+        startTime = time.time()
+        for w in range(numWorkers):
+            conn, workerConn = multiprocessing.Pipe()
+            p = multiprocessing.Process(target=runWorker, args=(workerConn, pdata, w, numWorkers))
+            p.daemon = True
+            p.start()
+            self.workers.append(p)
+            self.connections.append(conn)
+
+        # wait until every worker has built its models
+        for conn in self.connections:
+            conn.recv()
+        print "%d subproblem workers ready in %.2f (s)" % (numWorkers, time.time() - startTime)
+
+    def evaluate(self, nvals, numModels):
+        # send the [depot][vehicle type] leased fleet sizes to every worker and
+        # collect the (status, objective, hired fleet) result of each model
+        for conn in self.connections:
+            conn.send(("evaluate", nvals))
+
+        solution = self.pdata.problemSolution
+        modelResults = [None] * numModels
+        for conn in self.connections:
+            results, hits, misses, spTime = conn.recv()
+            for m, result in results:
+                modelResults[m] = result
+            solution.cacheHits += hits
+            solution.cacheMisses += misses
+            solution.subproblemTime += spTime
+
+        return modelResults
+
+    def submit(self, tag, nvals):
+        # asynchronous evaluate(), every worker gets the fleet sizes now and answers
+        # once it solved its models, after its answers to the earlier submissions
+        for w in range(self.numWorkers):
+            self.connections[w].send(("evaluate", nvals))
+            self.pending[w].append(tag)
+
+    def collect(self, timeout):
+        # (tag, [(model, result)]) of the worker answers that are ready, waiting up to
+        # timeout seconds (None waits for as long as it takes) for the first one
+        busy = [self.connections[w] for w in range(self.numWorkers) if len(self.pending[w]) > 0]
+        if len(busy) == 0:
+            return []
+
+        ready, unused, unused = select.select(busy, [], [], timeout)
+        solution = self.pdata.problemSolution
+        answers = []
+        for conn in ready:
+            w = self.connections.index(conn)
+            results, hits, misses, spTime = conn.recv()
+            solution.cacheHits += hits
+            solution.cacheMisses += misses
+            solution.subproblemTime += spTime
+            answers.append((self.pending[w].popleft(), results))
+
+        return answers
+
+    def getNumPending(self):
+        return sum([len(p) for p in self.pending])
+
+    def getValueTables(self):
+        # (model, table, number of solves) of every model, built by the workers in parallel
+        for conn in self.connections:
+            conn.send(("tables", None))
+
+        tables = []
+        for conn in self.connections:
+            workerTables, spTime = conn.recv()
+            tables.extend(workerTables)
+            self.pdata.problemSolution.subproblemTime += spTime
+
+        return tables
+
+    def close(self):
+        # the answers still on their way are read first, a worker blocked on a full pipe would never stop
+        while self.getNumPending() > 0:
+            self.collect(None)
+
+        for conn in self.connections:
+            conn.send(None)
+        for p in self.workers:
+            p.join()
+        self.workers = []
+        self.connections = []
+
+
+def runWorker(conn, pdata, worker, numWorkers):
+    # entry point of the worker processes, answers (command, fleet) requests until it gets None
+    from src.vrp.svrp.solver.SVRPCallback import SPSolver
+
+    spSolver = SPSolver(pdata, None, (worker, numWorkers))
+    solution = pdata.problemSolution
+    conn.send(True)
+
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+
+        command, nvals = request
+        hits, misses, spTime = solution.cacheHits, solution.cacheMisses, solution.subproblemTime
+        if command == "tables":
+            tables = spSolver.getShardValueTables()
+            conn.send((tables, solution.subproblemTime - spTime))
+        else:
+            results = spSolver.evaluateShard(nvals)
+            conn.send((results, solution.cacheHits - hits, solution.cacheMisses - misses,
+                       solution.subproblemTime - spTime))
+
+    conn.close()
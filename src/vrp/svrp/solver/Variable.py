@@ -6,6 +6,7 @@ class Variable:
     v_alpha = 4
     v_alphaH = 5
     v_yd = 6
+    v_alphaT = 7
     v_error = 10
 
     def __init__(self):